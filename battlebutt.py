@@ -12,6 +12,8 @@ import asyncpg
 
 from credentials import DISCORD_TOKEN, ERROR_CHANNEL, DEBUG_CHANNEL, POSTGRES_USER, POSTGRES_PASS, POSTGRES_DB
 from translator import ButtTranslator
+from ext.util.imagecache import ImageCache
+from ext.util.imagepool import ImagePool
 from typing import Optional
 
 
@@ -21,6 +23,8 @@ class Battlebutt(commands.Bot):
         *args,
         db: asyncpg.Pool,
         http_client: httpx.AsyncClient,
+        image_pool: ImagePool,
+        image_cache: ImageCache,
         error_channel: Optional[int] = None,
         debug_channel: Optional[int] = None,
         **kwargs,
@@ -28,6 +32,8 @@ class Battlebutt(commands.Bot):
         super().__init__(*args, **kwargs)
         self.db = db
         self.http_client = http_client
+        self.image_pool = image_pool
+        self.image_cache = image_cache
 
 
     async def setup_hook(self) -> None:
@@ -96,7 +102,8 @@ async def main():
         replied_user=False)
 
     async with httpx.AsyncClient(http2=True) as http_client, asyncpg.create_pool(
-        user=POSTGRES_USER, password=POSTGRES_PASS, database=POSTGRES_DB) as pool:
+        user=POSTGRES_USER, password=POSTGRES_PASS, database=POSTGRES_DB) as pool, \
+        ImagePool() as image_pool:
 
         async with Battlebutt(
             command_prefix=commands.when_mentioned_or('/'),
@@ -105,9 +112,12 @@ async def main():
             allowed_mentions=allowed_mentions,
             db=pool,
             http_client=http_client,
+            image_pool=image_pool,
+            image_cache=ImageCache(),
         ) as bot:
             await bot.tree.set_translator(ButtTranslator())
             await bot.start(DISCORD_TOKEN)
 
 
-asyncio.run(main())
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,26 +1,93 @@
 import discord
 from discord import app_commands
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from typing import Optional
-from random import choice, choices, randint, sample
+from random import choice, randint, sample
 
 from lxml import html
-from PIL import Image
 from io import BytesIO
-from base64 import b64decode
 from urllib.parse import quote
 
 import json
-
-from credentials import DEBUG_CHANNEL, GOOGLE_KEY
+import asyncio
+from datetime import datetime, timedelta, timezone
+from time import time
+
+from ext.util.cache import PersistentCache, create_cache_table
+from ext.util.datafile import DataFile
+from ext.util.github import GitHubCache
+from ext.util.imagecache import ImageCache
+from ext.util.imagepool import fetch_image
+from ext.util.sampling import AliasTable
+from credentials import DEBUG_CHANNEL, ERROR_CHANNEL, GITHUB_KEY, GOOGLE_KEY
 
 class Card(commands.Cog,
     command_attrs={"cooldown": commands.CooldownMapping.from_cooldown(
         2, 15, commands.BucketType.user)}):
 
+    # Bulk card datasets kept locally, with the function that cuts each one
+    # down to just what a pull needs
+    bulk_data = {
+        "lorcana": ("https://api.lorcana-api.com/bulk/cards",
+            lambda cards: [c["Image"] for c in cards]),
+        "sorcery": ("https://api.sorcerytcg.com/api/cards",
+            lambda cards: [[c["guardian"]["type"] == "Site",
+                [[v["slug"] for v in s["variants"]] for s in c["sets"]]]
+                for c in cards])
+    }
+    snapshot_ttl = timedelta(hours=12)
+    # Seconds a search's result count is trusted without being re-read
+    card_count_ttl = 6 * 60 * 60
+    # Sites with no API whose card lists get crawled into an index, each
+    # has a <name>_page(page) method returning (card images, page count)
+    scraped_games = ("gateruler", "cardfightvanguard")
+    index_ttl = timedelta(weeks=1)
+    crawl_concurrency = 4
+    # Tries per page before a crawl skips it, and how long to wait after a
+    # failed crawl before trying that site again
+    crawl_attempts = 3
+    crawl_retry = timedelta(hours=1)
+    # Format cards are re-encoded to when they have to be re-encoded
+    card_format = "WEBP"
+    # Drive folders listed in full in the background, so names in them
+    # never need a files.list query of their own
+    sorcery_folder = "17IrJkRGmIU9fDSTU2JQEU9JlFzb5liLJ"
+    drive_bulk_folders = (sorcery_folder,)
+
     def __init__(self, bot):
         self.bot = bot
+        self.card_counts = {}
+        self.snapshots = PersistentCache(bot.db, "card_snapshot",
+            self.snapshot_ttl)
+        self.indexes = PersistentCache(bot.db, "card_index", self.index_ttl)
+        self.crawl_tasks = {}
+        self.crawl_failed = {}
+        self.github = GitHubCache(bot.db, bot.http_client, GITHUB_KEY)
+        self.drive_folders = PersistentCache(bot.db, "drive_folder")
+        self.drive_files = PersistentCache(bot.db, "drive_file")
+        self.drive_names = {}
+        self.datasets = {
+            "neopets": DataFile("ext/data/neopets.json",
+                lambda f: AliasTable(json.load(f))),
+            "wow": DataFile("ext/data/wowtcg.json", self.weighted_sets),
+            "spellfire": DataFile("ext/data/spellfire.json",
+                self.weighted_sets),
+            "shadowverse": DataFile("ext/data/card/shadowverse.txt",
+                lambda f: AliasTable(f.read().splitlines())),
+            "onepiece": DataFile("ext/data/optcg.json",
+                lambda f: AliasTable(*zip(*json.load(f).items()))),
+            "wyvern": DataFile("ext/data/wyvern.json",
+                lambda f: AliasTable(json.load(f))),
+            "bellasara": DataFile("ext/data/bellasara.json",
+                lambda f: AliasTable(json.load(f)))
+        }
+        self.snapshot_refresh.start()
+
+    async def cog_unload(self):
+        self.snapshot_refresh.cancel()
+        for task in self.crawl_tasks.values():
+            task.cancel()
 
     @commands.hybrid_command()
     @app_commands.describe(game="TCG you want to pull a card from")
@@ -56,6 +123,246 @@ class Card(commands.Cog,
         return completes[:25] 
 
 
+    async def card_file(self, filename: str, url: str = None,
+        params: dict = None, blob: tuple = None, **kwargs):
+        """ Card image from a url or a (repo, sha) GitHub blob, processed in
+        the image pool with kwargs and kept in the image cache. filename's
+        extension is swapped to match img_format if one is given """
+
+        cache_key = ImageCache.key(blob[1] if blob else url,
+            *sorted(kwargs.items()))
+        card_img = await self.bot.image_cache.get(cache_key)
+        if card_img is None:
+            if blob:
+                data = await self.github.blob(*blob)
+            else:
+                data = await fetch_image(self.bot.http_client, url,
+                    params=params)
+            # Nothing to do to it, don't send it through a worker
+            card_img = data
+            if kwargs:
+                card_img = await self.bot.image_pool.process(data, **kwargs)
+            await self.bot.image_cache.put(cache_key, card_img)
+
+        if kwargs.get("img_format"):
+            ext = kwargs["img_format"].lower().replace("jpeg", "jpg")
+            filename = f"{filename.rsplit('.', 1)[0]}.{ext}"
+
+        return discord.File(fp=BytesIO(card_img), filename=filename)
+
+
+    @staticmethod
+    def weighted_sets(f):
+        j = json.load(f)
+        return AliasTable(j["sets"], j["weights"])
+
+
+    def pick(self, name: str):
+        """ Random entry of one of the static datasets """
+
+        return self.datasets[name].get().pick()
+
+
+    async def snapshot(self, name: str):
+        """ Compacted bulk dataset, only downloaded here the first time """
+
+        entry = await self.snapshots.get(name)
+        if not entry:
+            entry = await self.refresh_snapshot(name)
+
+        return entry.data
+
+
+    async def refresh_snapshot(self, name: str):
+        url, compact = self.bulk_data[name]
+
+        entry = await self.snapshots.get(name)
+        headers = entry.validators() if entry else {}
+
+        r = await self.bot.http_client.get(url, headers=headers)
+        if r.status_code == 304:
+            return await self.snapshots.touch(name)
+        r.raise_for_status()
+
+        return await self.snapshots.set(name, compact(r.json()),
+            r.headers.get("ETag"), r.headers.get("Last-Modified"))
+
+
+    @tasks.loop(hours=1.0)
+    async def snapshot_refresh(self):
+        await self.bot.wait_until_ready()
+
+        for name in self.bulk_data:
+            try:
+                if not self.snapshots.fresh(await self.snapshots.get(name)):
+                    await self.refresh_snapshot(name)
+            except Exception as e:
+                await self.bot.get_channel(ERROR_CHANNEL).send(
+                    f"Error in card.snapshot_refresh(): {type(e)} {e}")
+
+        for name in self.scraped_games:
+            if not self.indexes.fresh(await self.indexes.get(name)):
+                self.schedule_crawl(name)
+
+        for folder_id in self.drive_bulk_folders:
+            try:
+                await self.drive_folder(folder_id)
+            except Exception as e:
+                await self.bot.get_channel(ERROR_CHANNEL).send(
+                    f"Error in card.drive_folder(): {type(e)} {e}")
+
+
+    async def drive_folder(self, folder_id: str):
+        """ Every file in a Drive folder, listed once and kept """
+
+        entry = await self.drive_folders.get(folder_id)
+        if entry:
+            return entry.data
+
+        list_url = "https://www.googleapis.com/drive/v3/files"
+        list_params = {
+            "q": f"'{folder_id}' in parents",
+            "pageSize": 1000,
+            "fields": "nextPageToken, files(id, name, mimeType)",
+            "key": GOOGLE_KEY
+        }
+        files = []
+        while True:
+            r = await self.bot.http_client.get(list_url, params=list_params)
+            j = r.json()
+            files += j["files"]
+            if "nextPageToken" not in j:
+                break
+            list_params["pageToken"] = j["nextPageToken"]
+
+        return (await self.drive_folders.set(folder_id, files)).data
+
+
+    async def drive_file_id(self, folder_id: str, name: str):
+        """ Id of a named file in a Drive folder, from the folder's listing
+        if it's been listed, otherwise looked up once and remembered """
+
+        if folder_id not in self.drive_names:
+            listing = await self.drive_folders.get(folder_id)
+            if listing:
+                self.drive_names[folder_id] = {
+                    f["name"]: f["id"] for f in listing.data}
+
+        file_id = self.drive_names.get(folder_id, {}).get(name)
+        if file_id:
+            return file_id
+
+        key = f"{folder_id} {name}"
+        entry = await self.drive_files.get(key)
+        if not entry:
+            list_url = "https://www.googleapis.com/drive/v3/files"
+            list_params = {
+                "q": f"name = '{name}' and '{folder_id}' in parents",
+                "key": GOOGLE_KEY
+            }
+            r = await self.bot.http_client.get(list_url, params=list_params)
+            entry = await self.drive_files.set(key, r.json()["files"][0]["id"])
+
+        return entry.data
+
+
+    async def scraped_card(self, name: str):
+        """ Random card image from a scraped site, picked from the crawled
+        index once there is one and from a random live page until then """
+
+        entry = await self.indexes.get(name)
+        if not self.indexes.fresh(entry):
+            self.schedule_crawl(name)
+        if entry:
+            return choice(entry.data)
+
+        get_page = getattr(self, f"{name}_page")
+        cards, pages = await get_page()
+        selected_page = randint(1, pages)
+        if selected_page > 1:
+            cards, pages = await get_page(selected_page)
+
+        return choice(cards)
+
+
+    def schedule_crawl(self, name: str):
+        task = self.crawl_tasks.get(name)
+        if task and not task.done():
+            return
+
+        failed = self.crawl_failed.get(name)
+        if failed and datetime.now(timezone.utc) - failed < self.crawl_retry:
+            return
+
+        task = asyncio.create_task(self.crawl_index(name))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.crawl_tasks[name] = task
+
+
+    async def crawl_index(self, name: str):
+        get_page = getattr(self, f"{name}_page")
+        slots = asyncio.Semaphore(self.crawl_concurrency)
+
+        async def page_cards(page):
+            """ A page's cards, None if it kept failing """
+
+            for attempt in range(self.crawl_attempts):
+                try:
+                    async with slots:
+                        return (await get_page(page))[0]
+                except Exception:
+                    await asyncio.sleep(2 ** attempt)
+
+            return None
+
+        try:
+            cards, pages = await get_page()
+            results = await asyncio.gather(
+                *(page_cards(p) for p in range(2, pages+1)))
+            skipped = results.count(None)
+            for page in results:
+                cards += page or []
+            if not cards:
+                raise ValueError("crawl found no cards")
+        except Exception as e:
+            self.crawl_failed[name] = datetime.now(timezone.utc)
+            await self.bot.get_channel(ERROR_CHANNEL).send(
+                f"Error in card.crawl_index({name}): {type(e)} {e}")
+            raise
+
+        if skipped:
+            await self.bot.get_channel(ERROR_CHANNEL).send(
+                f"card.crawl_index({name}) skipped {skipped} of {pages} pages")
+
+        await self.indexes.set(name, list(dict.fromkeys(cards)))
+        self.crawl_failed.pop(name, None)
+
+
+    async def random_card(self, game: str, request, total, first):
+        """ Random result of a search fetched one result per page.
+        request(i) fetches the i-th result, total() and first() read the
+        result count and the result out of the JSON. The count is cached
+        and updated from each response, so a pull is usually one request """
+
+        cached = self.card_counts.get(game)
+        if cached and time() - cached[1] < self.card_count_ttl:
+            count = cached[0]
+        else:
+            count = int(total((await request(0)).json()))
+
+        for attempt in range(3):
+            j = (await request(randint(0, count-1))).json()
+            count = int(total(j))
+            self.card_counts[game] = (count, time())
+            try:
+                return first(j)
+            except (IndexError, KeyError):
+                # Cached count overshot, go again with the fresh one
+                pass
+
+        raise LookupError(f"Couldn't find a random {game} card")
+
+
     async def tcgplayer_rand(self, game: str):
         url = "https://mp-search-api.tcgplayer.com/v1/search/request"
         data = {
@@ -71,13 +378,22 @@ class Card(commands.Cog,
                 "order": "asc"
             }
         }
-        r = await self.bot.http_client.post(url, json=data)
-        card_count = r.json()["results"][0]["totalResults"]
-        data["from"] = randint(0, card_count-1)
 
-        r = await self.bot.http_client.post(url, json=data)
-        card = r.json()["results"][0]["results"][0]
-          
+        return await self.random_card(game,
+            lambda i: self.bot.http_client.post(url, json={**data, "from": i}),
+            lambda j: j["results"][0]["totalResults"],
+            lambda j: j["results"][0]["results"][0])
+
+
+    async def carde_card(self, game_id: str):
+        url = f"https://play-api.carde.io/v1/cards/{game_id}"
+
+        return await self.random_card(game_id,
+            lambda i: self.bot.http_client.get(url,
+                params={"limit": 1, "page": i+1}),
+            lambda j: j["pagination"]["totalPages"],
+            lambda j: j["data"][0])
+
 
     @commands.command(aliases=['poke'])
     async def pokemon(self, ctx, reason: Optional[str] = None):
@@ -122,21 +438,16 @@ class Card(commands.Cog,
         await ctx.defer()
 
         # Git tree for cardlist, updated 2025/07/10
+        repo = "TakaOtaku/Digimon-Cards"
         tree = "00bef43e2222b3635dd69da0271a840c90a7986c"
-        url = ("https://api.github.com/repos/TakaOtaku/"
-            f"Digimon-Cards/git/trees/{tree}")
-        r = await self.bot.http_client.get(url)
-        cards = r.json()["tree"]
+        cards = await self.github.tree(repo, tree)
 
         filters = ["-J.", "-j", "-Sample"]
         cards = [card for card in cards if not any(f in card["path"] for f in filters)]
         card = choice(cards)
 
-        r = await self.bot.http_client.get(card["url"])
-        img = b64decode(r.json()["content"])
-        file = discord.File(
-            fp=BytesIO(img),
-            filename=card["path"])
+        file = await self.card_file(card["path"],
+            blob=(repo, card["sha"]))
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'digimon'} {reason}:", file=file)
@@ -175,15 +486,11 @@ class Card(commands.Cog,
         await ctx.defer()
 
         url = "https://cards.fabtcg.com/api/search/v1/cards/"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        card_count = r.json()["count"]
-
-        params["offset"] = randint(0, int(card_count)-1)
-        r = await self.bot.http_client.get(url, params=params)
-        card = r.json()["results"][0]
+        card = await self.random_card("fleshandblood",
+            lambda i: self.bot.http_client.get(url,
+                params={"limit": 1, "offset": i}),
+            lambda j: j["count"],
+            lambda j: j["results"][0])
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'flesh and blood'} {reason}: [⠀]({card['image']['large']})")
@@ -196,41 +503,27 @@ class Card(commands.Cog,
         """ Pulls a Gate Ruler card """
         await ctx.defer()
 
-        # Get max page number
-        url = "https://www.gateruler-official.com/card_search"
-        r = await self.bot.http_client.get(url)
-        page = html.fromstring(r.text)
-
-        max_pages = page.xpath("//ul[@class='pagination']/li/a/text()")[-2]
-
-        # Pick random page
-        params = { "page": randint(1, int(max_pages)) }
-        r = await self.bot.http_client.get(url, params=params)
-        page = html.fromstring(r.text)
-
-        # Get random card       
-        cards = page.xpath("//li[@class='com_btm']/a/img/@src")
-        card_url = choice(cards)
-
-        r = await self.bot.http_client.get(card_url)
+        card_url = await self.scraped_card("gateruler")
 
         # Crop borders of card
-        card_img = Image.open(BytesIO(r.content))
-        card_img = card_img.crop(card_img.getbbox())
-
-        # Send to Discord
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=card_url.rsplit('/', 1)[1])
+        file = await self.card_file(card_url.rsplit('/', 1)[1],
+            card_url, crop=True, img_format=self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'gate ruler'} {reason}:", file=file)
         else:
             await ctx.send(file=file)
-  
+
+
+    async def gateruler_page(self, page: int = 1):
+        url = "https://www.gateruler-official.com/card_search"
+        r = await self.bot.http_client.get(url, params={"page": page})
+        page = html.fromstring(r.text)
+
+        max_pages = page.xpath("//ul[@class='pagination']/li/a/text()")[-2]
+        cards = page.xpath("//li[@class='com_btm']/a/img/@src")
+
+        return cards, int(max_pages)
 
 
     @commands.command(aliases=["cfv", "vanguard", "cardfight"])
@@ -238,30 +531,27 @@ class Card(commands.Cog,
         """ Pulls a Cardfight!! Vanguard card """
         await ctx.defer()
 
-        # Get first page to figure out max page
+        card = await self.scraped_card("cardfightvanguard")
+
+        if reason and ctx.interaction:
+            await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'cardfight vanguard'} {reason}: [⠀]({card})")
+        else:
+            await ctx.send(card)
+
+
+    async def cardfightvanguard_page(self, page: int = 1):
         url = "https://en.cf-vanguard.com/cardlist/cardsearch"
-        r = await self.bot.http_client.get(url)
+        r = await self.bot.http_client.get(url, params={"page": page})
         page = html.fromstring(r.text)
 
         # 24 cards per page
         card_count = page.xpath("//div[@class='number']/text()")[0]
         card_count = int(card_count[:-8])
-        params = {
-            "page": randint(1, int((card_count / 24) + 1))
-        }
-
-        # Get page with cards to pick
-        r = await self.bot.http_client.get(url, params=params)
-        page = html.fromstring(r.text)
+        cards = ["https://en.cf-vanguard.com{}".format(img)
+            for img in page.xpath("//img[@class='object-fit-img']/@src")]
 
-        # Pick card
-        card = "https://en.cf-vanguard.com{}".format(
-            choice(page.xpath("//img[@class='object-fit-img']/@src")))
+        return cards, int((card_count / 24) + 1)
 
-        if reason and ctx.interaction:
-            await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'cardfight vanguard'} {reason}: [⠀]({card})")
-        else:
-            await ctx.send(card)
 
     @commands.command()
     async def grandarchive(self, ctx, reason: Optional[str] = None):
@@ -307,9 +597,7 @@ class Card(commands.Cog,
         """ Pulls a Lorcana card """
         await ctx.defer()
 
-        r = await self.bot.http_client.get("https://api.lorcana-api.com/bulk/cards")
-        cards = r.json()
-        card_img = choice(cards)["Image"]
+        card_img = choice(await self.snapshot("lorcana"))
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'lorcana'} {reason}: [⠀]({card_img})")
@@ -323,21 +611,15 @@ class Card(commands.Cog,
         await ctx.defer()
 
         # Git tree for cardlist, updated 2025/06/24
+        repo = "MattJBrinkman/RedemptionLackeyCCG"
         tree = "bb007936c69375fdb5631becceafa62e4975e886"
-        url = ("https://api.github.com/repos/MattJBrinkman/"
-            f"RedemptionLackeyCCG/git/trees/{tree}")
-
-        r = await self.bot.http_client.get(url)
-        cards = r.json()["tree"]
+        cards = await self.github.tree(repo, tree)
 
         cards = [card for card in cards if ".jpg" in card["path"]]
         card = choice(cards)
 
-        r = await self.bot.http_client.get(card["url"])
-        img = b64decode(r.json()["content"])
-        file = discord.File(
-            fp=BytesIO(img),
-            filename=card["path"])
+        file = await self.card_file(card["path"],
+            blob=(repo, card["sha"]))
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'redemption'} {reason}:", file=file)
@@ -351,12 +633,9 @@ class Card(commands.Cog,
         await ctx.defer()
 
         # Git tree for cardlist, updated 2024/09/22
+        repo = "lionel-panhaleux/krcg-static"
         tree = "8661079bd3f85ce9bf899c23e945d8fd0f2a1334"
-        url = ("https://api.github.com/repos/lionel-panhaleux/"
-            f"krcg-static/git/trees/{tree}")
-
-        r = await self.bot.http_client.get(url)
-        cards = r.json()["tree"]
+        cards = await self.github.tree(repo, tree)
 
         # Filter out subdirectories
         cards = [card for card in cards if card["type"] == "blob"]
@@ -365,11 +644,8 @@ class Card(commands.Cog,
 
         card = choice(cards)
 
-        r = await self.bot.http_client.get(card["url"])
-        img = b64decode(r.json()["content"])
-        file = discord.File(
-            fp=BytesIO(img),
-            filename=card["path"])
+        file = await self.card_file(card["path"],
+            blob=(repo, card["sha"]))
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'vampire'} {reason}:", file=file)
@@ -382,19 +658,10 @@ class Card(commands.Cog,
         """ Pulls a Neopets card """
         await ctx.defer()
 
-        with open("ext/data/neopets.json") as f:
-            card = choice(json.load(f))
-
-        r = await self.bot.http_client.get(card)
+        card = self.pick("neopets")
 
-        card_img = Image.open(BytesIO(r.content)).convert('RGB')
-
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=card.rsplit('/', 1)[1].replace('.gif', '.png'))
+        file = await self.card_file(card.rsplit('/', 1)[1],
+            card, mode="RGB", img_format=self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'neopets'} {reason}:", file=file)
@@ -407,28 +674,13 @@ class Card(commands.Cog,
         """ Pulls a Sorcery card """
         await ctx.defer()
 
-        # Grab random card
-        card_url = "https://api.sorcerytcg.com/api/cards"
-        r = await self.bot.http_client.get(card_url)
-        card_json = choice(r.json())
-
-        # Get random set printing of the card
-        card_set = choice(card_json["sets"])
-        card_slug = choice(card_set["variants"])["slug"]
+        # Grab random card, then a random set printing of it
+        rotate, card_sets = choice(await self.snapshot("sorcery"))
+        card_slug = choice(choice(card_sets))
 
-        if card_json["guardian"]["type"] == "Site":
-            rotate = True
-        else:
-            rotate = False
-
-        # Get set folder from Google Drive
-        list_url = "https://www.googleapis.com/drive/v3/files"
-        list_params = {
-            "q": f"name = '{card_slug}.png' and '17IrJkRGmIU9fDSTU2JQEU9JlFzb5liLJ' in parents",
-            "key": GOOGLE_KEY
-        }
-        r = await self.bot.http_client.get(list_url, params=list_params)
-        card_id = r.json()["files"][0]["id"]
+        # Get card's file id in the Google Drive folder
+        card_id = await self.drive_file_id(self.sorcery_folder,
+            f"{card_slug}.png")
 
         #list_params["q"] = f"name = '{card_suffix}' and '{folder_id}' in parents"
         #r = await self.bot.http_client.get(list_url, params=list_params)
@@ -446,18 +698,8 @@ class Card(commands.Cog,
             "alt": "media",
             "key": GOOGLE_KEY
         }
-        r = await self.bot.http_client.get(get_url, params=get_params)
-        card_img = Image.open(BytesIO(r.content))
-        if rotate:
-            card_img = card_img.rotate(270, expand=1)
-
-        # Send to Discord
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=f"{card_slug}.png")
+        file = await self.card_file(f"{card_slug}.png", get_url, get_params,
+            rotate=270 if rotate else 0, img_format=self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'sorcery'} {reason}:", file=file)
@@ -471,19 +713,10 @@ class Card(commands.Cog,
         await ctx.defer()
 
         # Get Google Drive folder ID from weighted lists
-        with open("ext/data/wowtcg.json") as f:
-            j = json.load(f)
-        set_id = choices(j["sets"], j["weights"])[0]
+        set_id = self.pick("wow")
 
         # Get card file from folder list
-        list_url = "https://www.googleapis.com/drive/v3/files"
-        list_params = {
-            "q": f"'{set_id}' in parents",
-            "pageSize": 500,
-            "key": GOOGLE_KEY
-        }
-        r = await self.bot.http_client.get(list_url, params=list_params)
-        card_id = choice(r.json()["files"])["id"]
+        card_id = choice(await self.drive_folder(set_id))["id"]
 
         # Get card image binary
         get_url = f"https://www.googleapis.com/drive/v3/files/{card_id}"
@@ -492,16 +725,8 @@ class Card(commands.Cog,
             "alt": "media",
             "key": GOOGLE_KEY
         }
-        r = await self.bot.http_client.get(get_url, params=get_params)
-        card_img = Image.open(BytesIO(r.content))
-
-        # Send to Discord
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=f"{card_id}.png")
+        file = await self.card_file(f"{card_id}.png", get_url, get_params,
+            img_format=self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'warcraft'} {reason}:", file=file)
@@ -514,24 +739,14 @@ class Card(commands.Cog,
         """ Pulls a Spellfire card """
         await ctx.defer()
 
-        with open ("ext/data/spellfire.json") as f:
-            j = json.load(f)
-        set_tree = choices(j["sets"], j["weights"])[0]
-
-        url = ("https://api.github.com/repos/dumsantos/Spellfire_EN-BR/"
-            f"git/trees/{set_tree}")
-
-        r = await self.bot.http_client.get(url)
-        cards = r.json()["tree"]
+        repo = "dumsantos/Spellfire_EN-BR"
+        cards = await self.github.tree(repo, self.pick("spellfire"))
 
         cards = [card for card in cards if ".jpg" in card["path"]]
         card = choice(cards)
 
-        r = await self.bot.http_client.get(card["url"])
-        img = b64decode(r.json()["content"])
-        file = discord.File(
-            fp=BytesIO(img),
-            filename=card["path"])
+        file = await self.card_file(card["path"],
+            blob=(repo, card["sha"]))
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'spellfire'} {reason}:", file=file)
@@ -544,9 +759,7 @@ class Card(commands.Cog,
         """ Pulls a Shadowverse: Evolve card """
         await ctx.defer()
 
-        with open("ext/data/card/shadowverse.txt") as f:
-            cards = f.read().splitlines()
-        card = choice(cards)
+        card = self.pick("shadowverse")
 
         #headers = {
         #    "User-Agent": "battlebutt/1.0",
@@ -606,16 +819,13 @@ class Card(commands.Cog,
         url = "https://api.bandai-tcg-plus.com/api/user/card/list"
         params = {
             "game_title_id": 7,
-            "limit": 1,
-            "offset": 0
+            "limit": 1
         }
-        r = await self.bot.http_client.get(url, params=params)
-
-        count = r.json()["success"]["total"]
-        params["offset"] = randint(0, int(count)-1)
-
-        r = await self.bot.http_client.get(url, params=params)
-        card = r.json()["success"]["cards"][0]
+        card = await self.random_card("battlespirits",
+            lambda i: self.bot.http_client.get(url,
+                params={**params, "offset": i}),
+            lambda j: j["success"]["total"],
+            lambda j: j["success"]["cards"][0])
 
         if "backcard_image_url" in card:
             card_img = choice([card["image_url"], card["backcard_image_url"]])
@@ -633,18 +843,8 @@ class Card(commands.Cog,
         """ Pulls an Alpha Clash card """
         await ctx.defer()
 
-        url = "https://play-api.carde.io/v1/cards/64483da67fc2aee28c8427bf"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["pagination"]["totalPages"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card_img = r.json()["data"][0]["imageUrl"]
+        card_img = (await self.carde_card(
+            "64483da67fc2aee28c8427bf"))["imageUrl"]
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'alpha clash'} {reason}: [⠀]({card_img})")
@@ -663,14 +863,11 @@ class Card(commands.Cog,
             "variation[]": "standard",
             "rarity[]": ["COMMON", "RARE", "EXALTED"]
         }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["totalItems"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card = r.json()['member'][0]
+        card = await self.random_card("altered",
+            lambda i: self.bot.http_client.get(url,
+                params={**params, "page": i+1}),
+            lambda j: j["totalItems"],
+            lambda j: j["member"][0])
         card_img = f"https://cdn.alteredcore.org/cards/en/{card['set']['reference']}/{card['reference']}.webp"
 
         if reason and ctx.interaction:
@@ -684,32 +881,12 @@ class Card(commands.Cog,
         """ Pulls an Elestrals card """
         await ctx.defer()
 
-        url = "https://play-api.carde.io/v1/cards/64a31866dd516a3cc4c8d45c"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["pagination"]["totalPages"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card_url = r.json()["data"][0]["imageUrl"]
-
-        r = await self.bot.http_client.get(card_url)
+        card_url = (await self.carde_card(
+            "64a31866dd516a3cc4c8d45c"))["imageUrl"]
 
         # Crop borders of card
-        card_img = Image.open(BytesIO(r.content))
-        card_img = card_img.crop(card_img.getbbox())
-
-        # Send to Discord
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=card_url.rsplit('/', 1)[1])
+        file = await self.card_file(card_url.rsplit('/', 1)[1],
+            card_url, crop=True, img_format=self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'elestrals'} {reason}:", file=file)
@@ -722,18 +899,8 @@ class Card(commands.Cog,
         """ Pulls a Fabled Sagas card """
         await ctx.defer()
 
-        url = "https://play-api.carde.io/v1/cards/64626b9a9d5830157996b180"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["pagination"]["totalPages"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card_img = r.json()["data"][0]["imageUrl"]
+        card_img = (await self.carde_card(
+            "64626b9a9d5830157996b180"))["imageUrl"]
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'fabled sagas'} {reason}: [⠀]({card_img})")
@@ -746,18 +913,8 @@ class Card(commands.Cog,
         """ Pulls an Akora card """
         await ctx.defer()
 
-        url = "https://play-api.carde.io/v1/cards/636855fc34369ca07c26f17d"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["pagination"]["totalPages"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card_img = r.json()["data"][0]["imageUrl"]
+        card_img = (await self.carde_card(
+            "636855fc34369ca07c26f17d"))["imageUrl"]
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'akora'} {reason}: [⠀]({card_img})")
@@ -770,18 +927,8 @@ class Card(commands.Cog,
         """ Pulls a MetaZoo card """
         await ctx.defer()
 
-        url = "https://play-api.carde.io/v1/cards/6362b23bafcb45c0e3070ddf"
-        params = {
-            "limit": 1
-        }
-        r = await self.bot.http_client.get(url, params=params)
-        pages = r.json()["pagination"]["totalPages"]
-
-        selected_page = randint(1, int(pages))
-        params["page"] = selected_page
-
-        r = await self.bot.http_client.get(url, params=params)
-        card_img = r.json()["data"][0]["imageUrl"]
+        card_img = (await self.carde_card(
+            "6362b23bafcb45c0e3070ddf"))["imageUrl"]
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'metazoo'} {reason}: [⠀]({card_img})")
@@ -1037,26 +1184,13 @@ class Card(commands.Cog,
         await ctx.defer()
 
         # Get Google Drive folder ID from weighted lists
-        with open("ext/data/optcg.json") as f:
-            j = json.load(f)
-        sets = list(j.keys())
-        weights = []
-        for s in sets:
-            weights.append(j[s])
-
-        set_id = choices(sets, weights)[0]
+        set_id = self.pick("onepiece")
 
         # Get card file from folder list
-        list_url = "https://www.googleapis.com/drive/v3/files"
-        list_params = {
-            "q": f"'{set_id}' in parents",
-            "pageSize": 500,
-            "key": GOOGLE_KEY
-        }
-        r = await self.bot.http_client.get(list_url, params=list_params)
+        files = await self.drive_folder(set_id)
         found_valid = False
         while not found_valid:
-            card = choice(r.json()["files"])
+            card = choice(files)
             if "image" in card["mimeType"] and "Playmat" not in card["name"]:
                 found_valid = True
 
@@ -1067,19 +1201,9 @@ class Card(commands.Cog,
             "alt": "media",
             "key": GOOGLE_KEY
         }
-        r = await self.bot.http_client.get(get_url, params=get_params)
-        card_img = Image.open(BytesIO(r.content))
-
-        # Send to Discord
-        with BytesIO() as img_binary:
-            if "jpeg" in  card["mimeType"]:
-                card_img.save(img_binary, "JPEG")
-            else:
-                card_img.save(img_binary, 'PNG')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=card['name'])
+        file = await self.card_file(card['name'], get_url, get_params,
+            img_format="JPEG" if "jpeg" in card["mimeType"]
+                else self.card_format)
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'one piece'} {reason}:", file=file)
@@ -1091,9 +1215,7 @@ class Card(commands.Cog,
     async def wyvern(self, ctx, reason: Optional[str] = None):
         """ Pulls a Wyvern TCG card """
 
-        with open("ext/data/wyvern.json") as f:
-            j = json.load(f)
-        card = choice(j)
+        card = self.pick("wyvern")
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'wyvern'} {reason}: [⠀](https://api.ccgtrader.co.uk{card})")
@@ -1105,9 +1227,7 @@ class Card(commands.Cog,
     async def bellasara(self, ctx, reason: Optional[str] = None):
         """ Pulls a Bella Sara card """
 
-        with open("ext/data/bellasara.json") as f:
-            j = json.load(f)
-        card = choice(j)
+        card = self.pick("bellasara")
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'bella sara'} {reason}: [⠀](https://bellasara.wiki.gg/wiki/Special:FilePath/{card})")
@@ -1174,17 +1294,9 @@ class Card(commands.Cog,
         card_url = variant["imageUrl"]
         card_id = variant["variantNumber"]
 
-        r = await self.bot.http_client.get(card_url)
-        card_img = Image.open(BytesIO(r.content))
-        if "Battlefield" in card["type"]:
-            card_img = card_img.rotate(270, expand=1)
-        # Send to Discord
-        with BytesIO() as img_binary:
-            card_img.save(img_binary, 'WEBP')
-            img_binary.seek(0)
-            file = discord.File(
-                fp=img_binary,
-                filename=f"{card_id}.webp")
+        file = await self.card_file(f"{card_id}.webp", card_url,
+            rotate=270 if "Battlefield" in card["type"] else 0,
+            img_format="WEBP")
 
         if reason and ctx.interaction:
             await ctx.send(f"{'card' if ctx.interaction.extras['rando'] else 'riftbound'} {reason}:", file=file)
@@ -1227,4 +1339,5 @@ class Card(commands.Cog,
 
 
 async def setup(bot):
+    await create_cache_table(bot.db)
     await bot.add_cog(Card(bot))
\ No newline at end of file
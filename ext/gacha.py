@@ -1,5 +1,5 @@
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 from discord import app_commands
 
 from typing import Optional
@@ -7,21 +7,40 @@ import json
 import csv
 import re
 from time import time
-from datetime import datetime, timedelta
-from random import choice, choices, randint, sample
-from base64 import b64decode
+from datetime import datetime, timedelta, timezone
+from random import choice, choices, randint, sample, uniform
 from io import BytesIO
-from PIL import Image
 from urllib.parse import quote
 from lxml import html
 from zipfile import ZipFile
 import os
 from copy import copy
 import asyncio
+from collections import deque
 from urllib.parse import unquote
 
+from ext.util.attachments import AttachmentCache, CachedFile
+from ext.util.cache import CacheEntry, PersistentCache, create_cache_table
+from ext.util.github import GitHubCache
+from ext.util.imagecache import ImageCache
+from ext.util.imagepool import fetch_image
+from ext.util.rosterstore import RosterStore
 from credentials import DEBUG_CHANNEL, FNAPI_KEY, GITHUB_KEY, ERROR_CHANNEL
 
+
+class PullCapture:
+    """Stand-in context for running a gacha command ahead of time, post()
+    stores the finished pull here instead of sending it"""
+
+    interaction = None
+
+    def __init__(self):
+        self.pull = None
+
+    async def defer(self):
+        pass
+
+
 class Gacha(commands.Cog,
     command_attrs={"cooldown": commands.CooldownMapping.from_cooldown(
         2, 15, commands.BucketType.user)}):
@@ -29,11 +48,54 @@ class Gacha(commands.Cog,
     headers = {
         "User-Agent": "battlebutt/1.0"
     }
+    # Finished pulls kept ready per game for /gacha
+    prefetch_size = 2
+    # How long a crawled roster is served before it's refreshed, with up to
+    # roster_jitter_hours added per game so they don't all crawl at once
+    roster_age = timedelta(weeks=3)
+    roster_ages = {}
+    roster_jitter_hours = 48
+    # Wait this long after a failed crawl before trying that roster again
+    roster_retry = timedelta(hours=1)
+    # Offset-paged APIs are fetched this many pages at a time
+    page_concurrency = 4
+    # Category listings are reused for this long, then revalidated
+    category_ttl = timedelta(days=2)
+    # Extracted index pages are used this long before checking the revision
+    parse_ttl = timedelta(minutes=30)
+    # Most titles a single imageinfo query will resolve
+    imageinfo_batch = 50
+    # Files a wiki didn't have are asked about again after this long
+    missing_image_ttl = timedelta(days=1)
 
     def __init__(self, bot):
         self.bot = bot
         self.file_regex = re.compile(
             r'[^\/\\&\?]+\.\w{2,4}(?=(?:[\?&\/].*$|$))')
+        self.rosters = RosterStore(bot.db)
+        self.category_cache = PersistentCache(bot.db, "mediawiki_category",
+            self.category_ttl)
+        self.parse_cache = PersistentCache(bot.db, "mediawiki_parse",
+            self.parse_ttl)
+        self.image_index = PersistentCache(bot.db, "mediawiki_imageinfo")
+        self.index_tasks = {}
+        self.attachments = AttachmentCache(bot.db)
+        self.github = GitHubCache(bot.db, bot.http_client, GITHUB_KEY)
+        self.pulls = {}
+        self.prefetch_tasks = {}
+        self.roster_tasks = {}
+        self.roster_jitter = {}
+        self.roster_failed = {}
+        self.roster_refresh.start()
+
+    async def cog_unload(self):
+        self.roster_refresh.cancel()
+        for task in self.prefetch_tasks.values():
+            task.cancel()
+        for task in self.roster_tasks.values():
+            task.cancel()
+        for task in self.index_tasks.values():
+            task.cancel()
 
     @commands.hybrid_command()
     @app_commands.describe(game="Gacha you want to pull a character from")
@@ -61,7 +123,18 @@ class Gacha(commands.Cog,
             if ctx.interaction:
                 ctx.interaction.extras["random"] = True
 
-        await selected_comm.__call__(ctx)
+        try:
+            pull = await self.thaw_pull(
+                self.pulls[selected_comm.name].popleft())
+        except (KeyError, IndexError):
+            pull = None
+
+        if pull:
+            await self.post(ctx, **pull)
+        else:
+            await selected_comm.__call__(ctx)
+
+        self.schedule_prefetch(selected_comm)
 
 
     @gacha.autocomplete('game')
@@ -91,11 +164,72 @@ class Gacha(commands.Cog,
                 await asyncio.sleep(2)
 
 
+    def schedule_prefetch(self, command: commands.Command):
+        task = self.prefetch_tasks.get(command.name)
+        if not task or task.done():
+            self.prefetch_tasks[command.name] = asyncio.create_task(
+                self.prefetch(command))
+
+
+    async def prefetch(self, command: commands.Command):
+        pulls = self.pulls.setdefault(command.name, deque())
+
+        while len(pulls) < self.prefetch_size:
+            capture = PullCapture()
+            try:
+                await command.__call__(capture)
+            except Exception as e:
+                await self.bot.get_channel(ERROR_CHANNEL).send(
+                    f"Error in gacha.prefetch({command.name}): {type(e)} {e}")
+                return
+
+            if not capture.pull:
+                return
+            pulls.append(capture.pull)
+
+
+    def freeze_pull(self, **pull):
+        # discord.Files can only be sent once. Images from the image cache
+        # are read back from it when served, so only their key is held.
+        for key in ("img", "thumb"):
+            file = pull[key]
+            if isinstance(file, CachedFile) and file.cache_key:
+                pull[key] = (None, file.filename, file.cache_key)
+            elif isinstance(file, discord.File):
+                file.fp.seek(0)
+                pull[key] = (file.fp.read(), file.filename, None)
+
+        return pull
+
+
+    async def thaw_pull(self, pull: dict):
+        """Pull ready to post, or None if its image has since been evicted"""
+
+        pull = copy(pull)
+        for key in ("img", "thumb"):
+            if isinstance(pull[key], tuple):
+                data, filename, cache_key = pull[key]
+                if data is None:
+                    data = await self.bot.image_cache.get(cache_key)
+                    if data is None:
+                        return None
+                pull[key] = CachedFile(fp=BytesIO(data), filename=filename,
+                    cache_key=cache_key)
+
+        return pull
+
+
     async def post(self, ctx: commands.Context, img: discord.File|str,
         game_name: str, color: int, char_name: str, description: str = None,
         game_short: str = None, author: str = None,
         thumb: discord.File|str = None):
 
+        if isinstance(ctx, PullCapture):
+            ctx.pull = self.freeze_pull(img=img, game_name=game_name,
+                color=color, char_name=char_name, description=description,
+                game_short=game_short, author=author, thumb=thumb)
+            return
+
         embed = discord.Embed(
             title=char_name,
             description=description,
@@ -121,6 +255,9 @@ class Gacha(commands.Cog,
         except:
             pass
 
+        img = await self.reuse_upload(img)
+        thumb = await self.reuse_upload(thumb)
+
         files = []
         if isinstance(img, str):
             embed.set_image(url=img)
@@ -135,8 +272,24 @@ class Gacha(commands.Cog,
                 embed.set_thumbnail(url=thumb.uri)
                 files.append(thumb)
 
-        await ctx.send(msg, embed=embed, files=files)
-  
+        message = await ctx.send(msg, embed=embed, files=files)
+
+        embed = message.embeds[0]
+        for file, embed_img in ((img, embed.image), (thumb, embed.thumbnail)):
+            if isinstance(file, CachedFile) and file.cache_key \
+                and embed_img.url:
+                await self.attachments.set(file.cache_key, embed_img.url)
+
+
+    async def reuse_upload(self, file: discord.File|str):
+        """CDN url of an earlier upload of the same image, if still valid"""
+
+        if isinstance(file, CachedFile) and file.cache_key:
+            url = await self.attachments.get(file.cache_key)
+            if url:
+                return url
+
+        return file
 
 
     async def url_to_file(self, url: str, filename: str = None, 
@@ -148,40 +301,29 @@ class Gacha(commands.Cog,
         if not headers:
             headers = copy(self.headers)
 
-        r = await self.bot.http_client.get(url=url, headers=headers,
-            follow_redirects=True)
+        key = ImageCache.key(url, "crop", resize, resample)
+        img = await self.bot.image_cache.get(key)
+        if img is None:
+            data = await fetch_image(self.bot.http_client, url, headers)
+            img = await self.bot.image_pool.process(data, crop=True,
+                resize=resize, resample=resample)
+            await self.bot.image_cache.put(key, img)
 
-        if 'application/json' in r.headers.get('Content-Type', ''):
-            img = Image.open(BytesIO(b64decode(r.json()["content"])))
-        else:
-            img = Image.open(BytesIO(r.content))
-        img_format = img.format
-
-        img = img.crop(img.getbbox())
-
-        if resize > 0.0:
-            img = img.resize(
-                (int(img.width*resize), int(img.height*resize)),
-                resample=resample)
-
-        with BytesIO() as img_binary:
-            img.save(img_binary, img_format)
-            img_binary.seek(0)
-            file = discord.File(fp=img_binary, filename=filename)
-
-        return file
+        return CachedFile(fp=BytesIO(img), filename=filename, cache_key=key)
 
 
     async def get_github(self, repo: str, tree: str):
 
-        url = f"https://api.github.com/repos/{repo}/git/trees/{tree}"
-        headers = { "Authorization": f"Bearer {GITHUB_KEY}" }
-
-        r = await self.bot.http_client.get(url, headers=headers)
-        char = choice(r.json()["tree"])
+        char = choice(await self.github.tree(repo, tree))
 
-        file = await self.url_to_file(url=char["url"],
-            filename=char["path"], headers=headers)
+        key = ImageCache.key(char["sha"], "crop")
+        img = await self.bot.image_cache.get(key)
+        if img is None:
+            data = await self.github.blob(repo, char["sha"])
+            img = await self.bot.image_pool.process(data, crop=True)
+            await self.bot.image_cache.put(key, img)
+        file = CachedFile(fp=BytesIO(img), filename=char["path"],
+            cache_key=key)
 
         return file, char["path"]
 
@@ -189,29 +331,93 @@ class Gacha(commands.Cog,
     async def get_imageinfo(self, url, filename,
         reize=0.0, resample=False):
 
+        index = await self.resolve_images(url, [filename])
+        img = index.get(filename)
+        if not img:
+            raise ValueError(f"No imageinfo for File:{filename} on {url}")
+
+        headers = copy(self.headers)
+        headers["Host"] = img[8:].split("/", 1)[0]
+
+        try:
+            return await self.url_to_file(img, headers=headers)
+        except Exception:
+            # The file may have moved, resolve it again next time
+            await self.image_index.delete(f"{url} {filename}")
+            raise
+
+
+    async def resolve_images(self, url, filenames):
+        """Returns filename -> image url for filenames on a wiki, resolving
+        the ones that aren't indexed yet. Files the wiki doesn't have are
+        kept as None for missing_image_ttl so indexing doesn't keep asking
+        for them."""
+
+        filenames = list(dict.fromkeys(filenames))
+        entries = await self.image_index.get_many(
+            [f"{url} {f}" for f in filenames])
+
+        index = {}
+        now = datetime.now(timezone.utc)
+        for f in filenames:
+            entry = entries.get(f"{url} {f}")
+            if entry and (entry.data
+                or now - entry.updated < self.missing_image_ttl):
+                index[f] = entry.data
+
+        missing = [f for f in filenames if f not in index]
+        if not missing:
+            return index
+
         headers = copy(self.headers)
         headers["Host"] = url[8:].split("/", 1)[0]
 
-        params = {
-            "action": "query",
-            "prop": "imageinfo",
-            "titles": f"File:{filename}",
-            "format": "json",
-            "iiprop": "url"
-        }
+        for i in range(0, len(missing), self.imageinfo_batch):
+            batch = missing[i:i+self.imageinfo_batch]
+            params = {
+                "action": "query",
+                "prop": "imageinfo",
+                "titles": "|".join(f"File:{f}" for f in batch),
+                "format": "json",
+                "iiprop": "url"
+            }
+            r = await self.bot.http_client.get(url=url,
+                params=params, headers=headers)
+            query = r.json()["query"]
 
-        r = await self.bot.http_client.get(url=url,
-            params=params, headers=self.headers)
+            # Map the titles the wiki normalised back to what was asked for
+            asked = {f"File:{f}": f for f in batch}
+            for n in query.get("normalized", []):
+                asked[n["to"]] = asked.pop(n["from"], n["from"])
 
-        results = list(r.json()["query"]["pages"].values())
-        img = results[0]["imageinfo"][0]["url"]
+            resolved = {}
+            for page in query["pages"].values():
+                filename = asked.get(page["title"])
+                if filename:
+                    resolved[filename] = page.get(
+                        "imageinfo", [{}])[0].get("url")
+
+            await self.image_index.set_many(
+                {f"{url} {f}": img for f, img in resolved.items()})
+            index.update(resolved)
+
+        return index
 
-        headers["Host"] = img[8:].split("/", 1)[0]
 
-        return await self.url_to_file(img, headers=headers)
+    def index_images(self, url, filenames):
+        """Resolves a wiki's candidate images in the background, so pulls
+        only need the image itself"""
 
+        task = self.index_tasks.get(url)
+        if task and not task.done():
+            return
 
-    async def mediawiki_parse(self, url, page):
+        task = asyncio.create_task(self.resolve_images(url, filenames))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self.index_tasks[url] = task
+
+
+    async def mediawiki_parse(self, url, page, revid: bool = False):
 
         headers = copy(self.headers)
         headers["Host"] = url[8:].split("/", 1)[0]
@@ -223,16 +429,97 @@ class Gacha(commands.Cog,
         }
         r = await self.bot.http_client.get(url, params=params,
             headers=headers, timeout=15)
+        parsed = r.json()["parse"]
 
-        page = html.fromstring(
-            r.json()["parse"]["text"]["*"].replace('\"','"'))
+        page = html.fromstring(parsed["text"]["*"].replace('\"','"'))
 
+        if revid:
+            return page, parsed["revid"]
         return page
 
 
+    async def mediawiki_revid(self, url, page):
+
+        headers = copy(self.headers)
+        headers["Host"] = url[8:].split("/", 1)[0]
+
+        params = {
+            "action": "query",
+            "prop": "revisions",
+            "titles": page,
+            "rvprop": "ids",
+            "format": "json"
+        }
+        r = await self.bot.http_client.get(url, params=params,
+            headers=headers)
+
+        try:
+            result = list(r.json()["query"]["pages"].values())[0]
+            return result["revisions"][0]["revid"]
+        except (KeyError, IndexError):
+            return None
+
+
+    def xpath_rows(self, page, rows: str, *fields: str):
+        """First match of each field xpath within every row, skipping rows
+        that are missing any of them"""
+
+        results = []
+        for row in page.xpath(rows):
+            values = [row.xpath(field) for field in fields]
+            if all(values):
+                results.append([v[0] for v in values])
+
+        return results
+
+
+    async def mediawiki_extract(self, url, page, extract: str|tuple):
+        """Results of an xpath, or of xpath_rows for a tuple of xpaths,
+        cached against the page's revision so it's only parsed per edit"""
+
+        if isinstance(extract, str):
+            key = f"{url} {page} {extract}"
+        else:
+            key = f"{url} {page} {' '.join(extract)}"
+
+        entry = await self.parse_cache.get(key)
+        if self.parse_cache.fresh(entry):
+            return entry.data["data"]
+
+        if entry:
+            revid = await self.mediawiki_revid(url, page)
+            if revid and revid == entry.data["revid"]:
+                await self.parse_cache.touch(key)
+                return entry.data["data"]
+
+        tree, revid = await self.mediawiki_parse(url, page, revid=True)
+        if isinstance(extract, str):
+            data = tree.xpath(extract)
+        else:
+            data = self.xpath_rows(tree, *extract)
+
+        # Round trip so lxml strings don't keep the whole tree alive
+        data = json.loads(json.dumps(data))
+        await self.parse_cache.set(key, {"revid": revid, "data": data})
+
+        return data
+
+
     async def mediawiki_category(self, url: str, category: str, 
         bad_pages: list = [], vignette: bool = False):
-        
+
+        key = f"{url} {category} {vignette}"
+        entry = await self.category_cache.get(key)
+        if not self.category_cache.fresh(entry):
+            entry = await self.fetch_category(url, category, vignette, entry)
+
+        return [a for a in entry.data if a["pageid"] not in bad_pages]
+
+
+    async def fetch_category(self, url: str, category: str, vignette: bool,
+        entry: CacheEntry = None):
+
+        key = f"{url} {category} {vignette}"
         headers = copy(self.headers)
         headers["Host"] = url[8:].split("/", 1)[0]
 
@@ -253,122 +540,194 @@ class Gacha(commands.Cog,
             params["cmlimit"] = "500"
             cont_key = "cmcontinue"
 
-        finished = False
-        article_list = []
-        while not finished:
-            r = await self.bot.http_client.get(url, 
-                params=params, headers=headers,
-                follow_redirects=True)
-            results = r.json()
-
-            if "continue" in results:
-                params[cont_key] = results["continue"][cont_key]
-            else:
-                finished = True
+        # Only the first page can be conditional, so validators are only
+        # kept for listings that fit on it. Longer ones are fetched again.
+        first_headers = copy(headers)
+        if entry:
+            first_headers.update(entry.validators())
 
-            if vignette:
-                for page in results["query"]["pages"].values():
-                    if page["pageid"] not in bad_pages:
+        next_page = asyncio.create_task(self.bot.http_client.get(url,
+            params=params, headers=first_headers, follow_redirects=True))
+        article_list = []
+        validators = None
+        try:
+            while next_page:
+                r = await next_page
+                next_page = None
+                if r.status_code == 304:
+                    return await self.category_cache.touch(key)
+                if not validators:
+                    validators = (r.headers.get("ETag"),
+                        r.headers.get("Last-Modified"))
+                results = r.json()
+
+                # Start on the next page before going through this one
+                if "continue" in results:
+                    validators = (None, None)
+                    params = copy(params)
+                    params[cont_key] = results["continue"][cont_key]
+                    next_page = asyncio.create_task(
+                        self.bot.http_client.get(url, params=params,
+                        headers=headers, follow_redirects=True))
+
+                if vignette:
+                    for page in results["query"]["pages"].values():
                         if "pageimage" in page:
                             article_list.append(page)
-            else:
-                for article in results["query"]["categorymembers"]:
-                    if article["pageid"] not in bad_pages:
+                else:
+                    for article in results["query"]["categorymembers"]:
                         if article["ns"] == 0:
                             article_list.append(article)
+        finally:
+            if next_page:
+                next_page.cancel()
 
-        return article_list
+        return await self.category_cache.set(key, article_list, *validators)
 
 
-    def check_cache(self, filename: str):
-        try:            
-            with open(f"ext/data/gacha/{filename}.json",
-                encoding="utf-8") as f:
-                j = json.load(f)
-        except:
-            return []
+    async def cargoquery(self, url: str, params: dict):
+        """All rows of a cargoquery, requesting page_concurrency pages at
+        once until one comes back short"""
 
-        last_up = datetime.utcfromtimestamp(j["updated"])
-        if (datetime.utcnow() - last_up) / timedelta(weeks=1) > 3:
-            if "bad_pages" in j.keys():
-                return None, j["bad_pages"]
-            else:
-                return None
-        else:
-            if "bad_pages" in j.keys():
-                return j["characters"], j["bad_pages"]
-            return j["characters"]
+        async def get_page(offset):
+            page_params = copy(params)
+            page_params["offset"] = offset
+            r = await self.bot.http_client.get(url,
+                params=page_params, headers=self.headers)
+            return r.json()["cargoquery"]
+
+        limit = params["limit"]
+        offset = 0
+        rows = []
+        while True:
+            pages = await asyncio.gather(*[get_page(offset + i*limit)
+                for i in range(self.page_concurrency)])
+            for page in pages:
+                rows.extend(page)
+
+            if any(len(page) < limit for page in pages):
+                return rows
+            offset += limit * self.page_concurrency
+
+
+    async def roster_pick(self, name: str):
+        """Random character from a stored roster. Only waits on a crawl if
+        there's nothing stored yet, stale rosters are refreshed behind it"""
+
+        info = await self.rosters.info(name)
+        if not info or not info[1]:
+            await self.refresh_roster(name)
+        elif self.roster_due(name, info[0]):
+            self.refresh_roster(name)
+
+        return await self.rosters.pick(name)
+
+
+    def roster_due(self, name: str, updated: datetime):
+        if name not in self.roster_jitter:
+            self.roster_jitter[name] = timedelta(
+                hours=uniform(0, self.roster_jitter_hours))
+
+        max_age = self.roster_ages.get(name, self.roster_age)
+        return (datetime.now(timezone.utc) - updated
+            > max_age + self.roster_jitter[name])
+
+
+    def refresh_roster(self, name: str):
+        """Crawls a roster in the background, returning the task so callers
+        with nothing to serve can wait on it. Within roster_retry of a
+        failed crawl the failed task is returned instead of a new one."""
+
+        task = self.roster_tasks.get(name)
+        failed = self.roster_failed.get(name)
+        backoff = failed and \
+            datetime.now(timezone.utc) - failed < self.roster_retry
+        if not task or task.done() and not backoff:
+            task = asyncio.create_task(self.crawl_roster(name))
+            # Errors are reported in crawl_roster, don't warn about them again
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            self.roster_tasks[name] = task
+
+        return task
 
 
-    def write_cache(self, filename: str,
-        characters: list, bad_pages: list = []):
+    async def crawl_roster(self, name: str):
+        crawler = getattr(self, f"crawl_{name}")
+        try:
+            characters = await crawler()
+            # Keep serving the old roster rather than an empty one
+            if not characters:
+                raise ValueError("crawl found no characters")
+        except Exception as e:
+            self.roster_failed[name] = datetime.now(timezone.utc)
+            await self.bot.get_channel(ERROR_CHANNEL).send(
+                f"Error in gacha.crawl_roster({name}): {type(e)} {e}")
+            raise
+
+        # Swapped in whole, pulls keep using the old roster until now
+        await self.rosters.put(name, characters)
+        self.roster_jitter.pop(name, None)
+        self.roster_failed.pop(name, None)
+
+
+    @tasks.loop(hours=1.0)
+    async def roster_refresh(self):
+        await self.bot.wait_until_ready()
+
+        for attr in dir(self):
+            if not attr.startswith("crawl_") or attr == "crawl_roster":
+                continue
+
+            name = attr[6:]
+            info = await self.rosters.info(name)
+            if info and self.roster_due(name, info[0]):
+                try:
+                    await self.refresh_roster(name)
+                except Exception:
+                    pass
 
-        data = {
-            "updated": int(datetime.utcnow().timestamp()),
-            "characters": characters
+
+    async def crawl_gbf(self):
+        params = {
+            "action": "cargoquery",
+            "tables": "characters",
+            "fields": "name,title,art1,art2,art3",
+            "format": "json",
+            "limit": 500
         }
+        url = "https://gbf.wiki/api.php"
+
+        characters = []
+        for c in await self.cargoquery(url, params):
+            c = c['title']
+            char = {
+                "name": c['name'].replace('&#039;','\''),
+                "title": c['title'].replace('&#039;','\''),
+                "arts": [quote(c['art1']), quote(c['art2'])]
+            }
+            if c['art3']:
+                char['arts'].append(quote(c['art3']))
 
-        if bad_pages:
-            data["bad_pages"] = bad_pages
+            # Edge case with encoding of mu character
+            if '\u03bc' in char['name']:
+                char['name'] = char['name'].split(',')[0]
+                arts = []
+                for art in char['arts']:
+                    new_art = f"%CE%BC%27s%20{art.split('%20')[1]}"
+                    arts.append(new_art)
+                char['arts'] = arts
 
-        with open(f"ext/data/gacha/{filename}.json", "w",
-            encoding="utf-8") as f:
-            json.dump(data, f)
+            characters.append(char)
+
+        return characters
 
 
     @commands.command(aliases=['gbf'], hidden=True)
     async def granblue(self, ctx):
         await ctx.defer()
 
-        characters = self.check_cache("gbf")
-        if not characters:
-            params = {
-                "action": "cargoquery",
-                "tables": "characters",
-                "fields": "name,title,art1,art2,art3",
-                "format": "json",
-                "limit": 500
-            }
-            url = "https://gbf.wiki/api.php"
-
-            finished = False
-            offset = 0
-            characters = []
-            while not finished:
-                params["offset"] = offset
-                r = await self.bot.http_client.get(url,
-                    params=params, headers=self.headers)
-                results = r.json()["cargoquery"]
-
-                if len(results) < 500:
-                    finished = True
-                else:
-                    offset += 500
-
-                for c in results:
-                    c = c['title']
-                    char = {
-                        "name": c['name'].replace('&#039;','\''),
-                        "title": c['title'].replace('&#039;','\''),
-                        "arts": [quote(c['art1']), quote(c['art2'])]
-                    }
-                    if c['art3']:
-                        char['arts'].append(quote(c['art3']))
-
-                    # Edge case with encoding of mu character 
-                    if '\u03bc' in char['name']:
-                        char['name'] = char['name'].split(',')[0]
-                        arts = []
-                        for art in char['arts']:
-                            new_art = f"%CE%BC%27s%20{art.split('%20')[1]}"
-                            arts.append(new_art)
-                        char['arts'] = arts
-
-                    characters.append(char)
-
-            self.write_cache("gbf", characters)
-
-        char = choice(characters)
+        char = await self.roster_pick("gbf")
+
         img = choice(char['arts'])
 
         file = await self.url_to_file(
@@ -389,9 +748,7 @@ class Gacha(commands.Cog,
 
         await self.bot.get_channel(DEBUG_CHANNEL).send(f"feh {char}")
 
-        page = await self.mediawiki_parse(url, char)
-
-        img = choice(page.xpath(
+        img = choice(await self.mediawiki_extract(url, char,
             "//div[@class='fehwiki-tabber']/span/a[1]/@href"))
 
         file = await self.url_to_file(img)
@@ -455,38 +812,38 @@ class Gacha(commands.Cog,
         await ctx.defer()
         url = "https://www.mariowiki.com/api.php"
 
-        page = await self.mediawiki_parse(url,
-            "Gallery:Mario_Kart_Tour_sprites_and_models")
+        characters = await self.mediawiki_extract(url,
+            "Gallery:Mario_Kart_Tour_sprites_and_models",
+            ("//span[@id='In-game_portraits']/../following-sibling::ul[1]/li",
+            ".//div/p/a/text()", ".//a[@class='image']/img/@src"))
+        name, img = choice(characters)
 
-        characters = page.xpath(
-            "//span[@id='In-game_portraits']/../following-sibling::ul[1]/li")
-        character = choice(characters)
-
-        name = character.xpath(".//div/p/a/text()")[0]
         title = ""
         if " (" in name:
             name, title = name.rsplit(" (", 1)
             title = title[:-1] 
 
-        img = character.xpath(".//a[@class='image']/img/@src")[0].rsplit(
-            "/", 1)[0].replace('/thumb', '')
+        img = img.rsplit("/", 1)[0].replace('/thumb', '')
 
         await self.post(ctx, img, "Mario Kart Tour", 0xe60012, name, title)
 
 
+    async def crawl_fortnite(self):
+        url = f"https://fortnite.fandom.com/api.php"
+
+        bad_pages = await self.rosters.bad_pages("fortnite")
+        characters = await self.mediawiki_category(url,
+            "Category:Outfits", bad_pages)
+
+        return characters
+
+
     @commands.command()
     async def fortnite(self, ctx):
         await ctx.defer()
         url = f"https://fortnite.fandom.com/api.php"
 
-        characters, bad_pages = self.check_cache("fortnite")
-        if not characters:
-            characters = await self.mediawiki_category(url,
-                "Category:Outfits")
-
-            self.write_cache("fortnite", characters, bad_pages)
-
-        char = choice(characters)
+        char = await self.roster_pick("fortnite")
 
         page = await self.mediawiki_parse(url, char["title"])
 
@@ -499,6 +856,7 @@ class Gacha(commands.Cog,
                 featured.append(img_url)
 
         if not featured:
+            await self.rosters.add_bad_page("fortnite", char["pageid"])
             raise ValueError((
                 "No featured image found, potentially bad page: "
                 f"{char['title']} (ID: {char['pageid']})"))
@@ -618,28 +976,30 @@ class Gacha(commands.Cog,
         await self.post(ctx, file, "SINoALICE", 0xfafafa, name, title)
 
 
-    @commands.command(aliases=['touhou'])
-    async def touhoulostword(self, ctx):
-        await ctx.defer()
+    async def crawl_touhou(self):
         base_url = "https://lostwordchronicle.com"
 
-        characters = self.check_cache("touhou")
-        if not characters:
-            r = await self.bot.http_client.get(
-                f"{base_url}/characters/ajax")
-            results = r.json()["data"]
+        r = await self.bot.http_client.get(
+            f"{base_url}/characters/ajax")
+        results = r.json()["data"]
+
+        characters = []
+        for r in results:
+            char = {
+                "name": f"{r['name']} ({r['universe']})",
+                "id": r['character']
+            }
+            characters.append(char)
 
-            characters = []
-            for r in results:
-                char = {
-                    "name": f"{r['name']} ({r['universe']})",
-                    "id": r['character']
-                }
-                characters.append(char)
+        return characters
 
-            self.write_cache("touhou", characters)
 
-        char = choice(characters)
+    @commands.command(aliases=['touhou'])
+    async def touhoulostword(self, ctx):
+        await ctx.defer()
+        base_url = "https://lostwordchronicle.com"
+
+        char = await self.roster_pick("touhou")
 
         r = await self.bot.http_client.get(
             f"{base_url}/lorepedia/characters/{char['id']}")
@@ -726,31 +1086,31 @@ class Gacha(commands.Cog,
         with open("ext/data/gacha/bfunits.txt", encoding="utf-8") as f:
             title = choice([line.rstrip() for line in f])
 
-        page = await self.mediawiki_parse(url, title)
-
-        img = page.xpath(("//div[@class='tabber wds-tabber']/div/div/center"
-            "/span/a/@href"))[0]
+        img = (await self.mediawiki_extract(url, title,
+            ("//div[@class='tabber wds-tabber']/div/div/center"
+            "/span/a/@href")))[0]
 
         file = await self.url_to_file(img)
 
         await self.post(ctx, file, "Brave Frontier", 0xbfb135, title)
 
 
+    async def crawl_langrisser(self):
+        url = "https://wiki.biligame.com/langrisser/api.php"
+
+        characters = await self.mediawiki_category(url,
+            category="分类:英雄")
+
+        return characters
+
+
     @commands.command()
     async def langrisser(self, ctx):
         await ctx.defer()
         
         url = "https://wiki.biligame.com/langrisser/api.php"
 
-        characters = self.check_cache("langrisser")
-        if not characters:
-            
-            characters = await self.mediawiki_category(url,
-                category="分类:英雄")
-
-            self.write_cache("langrisser", characters)              
-
-        char = choice(characters)["title"]
+        char = (await self.roster_pick("langrisser"))["title"]
 
         page = await self.mediawiki_parse(url, char)        
 
@@ -884,6 +1244,7 @@ class Gacha(commands.Cog,
         char_list = await self.mediawiki_category(url,
             "Category:Heroes", bad_pages, vignette=True)
         char = choice(char_list)
+        self.index_images(url, [c["pageimage"] for c in char_list])
 
         file = await self.get_imageinfo(url, char['pageimage'])
 
@@ -953,7 +1314,11 @@ class Gacha(commands.Cog,
         url = "https://starocean.fandom.com/api.php"
 
         with open("ext/data/gacha/starocean.json") as f:
-            char = choice(json.load(f))
+            chars = json.load(f)
+        self.index_images(url,
+            [v["img"] for c in chars for v in c["variants"]])
+
+        char = choice(chars)
         variant = choice(char["variants"])
 
         file = await self.get_imageinfo(url, variant["img"])
@@ -1019,17 +1384,19 @@ class Gacha(commands.Cog,
 
         url = "https://anothereden.wiki/api.php"
             
-        page = await self.mediawiki_parse(url, "Collection_Tracker")
+        chars = await self.mediawiki_extract(url, "Collection_Tracker",
+            ("//div[@class='tracker-item tracker-character']",
+            "./@data-name", ".//a/img/@src"))
+        self.index_images(url,
+            [c[1][13:-9].replace("command", "base") for c in chars])
 
-        char = choice(page.xpath(
-            "//div[@class='tracker-item tracker-character']"))
-        name = char.xpath("./@data-name")[0]
+        name, img = choice(chars)
         if " (" in name:
             name, title = name.split(" (")
             title = title[:-1]
         else:
             title = ""
-        img = char.xpath(".//a/img/@src")[0][13:-9].replace("command", "base")
+        img = img[13:-9].replace("command", "base")
         
         file = await self.get_imageinfo(url, img)
 
@@ -1043,7 +1410,12 @@ class Gacha(commands.Cog,
 
         with open("ext/data/gacha/terrabattle.json") as f:
             chars = json.load(f)
-            char = choice(list(chars.keys()))
+        imgs = [v["img"] for c in chars.values() for v in c]
+        self.index_images(url, [i for i in imgs if "Guardian " not in i])
+        self.index_images(url.replace("e.f", "e2.f"),
+            [i for i in imgs if "Guardian " in i])
+
+        char = choice(list(chars.keys()))
         variant = choice(chars[char])
 
         game_name = "Terra Battle"
@@ -1056,21 +1428,23 @@ class Gacha(commands.Cog,
         await self.post(ctx, file, game_name, 0x648ba5, char, variant["title"])
 
 
+    async def crawl_ptn(self):
+        base_url = "https://pathtonowhere.wiki.gg"
+        url = f"{base_url}/api.php"
+
+        characters = await self.mediawiki_category(url,
+            "Category:Sinner Attires")
+
+        return characters
+
+
     @commands.command(aliases=['ptn'])
     async def pathtonowhere(self, ctx):
         await ctx.defer()
         base_url = "https://pathtonowhere.wiki.gg"
         url = f"{base_url}/api.php"
 
-        characters = self.check_cache("ptn")
-        if not characters:
-            
-            characters = await self.mediawiki_category(url,
-                "Category:Sinner Attires")
-
-            self.write_cache("ptn", characters)            
-
-        char = choice(characters)["title"]
+        char = (await self.roster_pick("ptn"))["title"]
         char_name = char.rsplit("/", 1)[0]
         await self.bot.get_channel(DEBUG_CHANNEL).send(f"ptn {char}")
 
@@ -1101,42 +1475,44 @@ class Gacha(commands.Cog,
                 0xa21f23, char_name, title)
 
 
+    async def crawl_p5x(self):
+        url = "https://lufel.net/"
+
+        r = await self.bot.http_client.get(
+            f"{url}data/character_info.js")
+        temp_dict = r.text.split(
+            "Object.assign(window.characterData, ")[1].rsplit(
+            ");", 1)[0]
+        #temp_dict = "{\n" + temp_dict.replace(',\n    },', '\n    },')
+        #temp_dict = temp_dict.replace(',\n        },', '\n        },')
+        #temp_dict = temp_dict.replace('},\n\n    ', '},\n     ')
+
+        char_dict = json.loads(temp_dict)
+        characters = []
+        for key in list(char_dict.keys()):
+            if "persona3" in char_dict[key]:
+                title = "S.E.E.S."
+            else:
+                title = char_dict[key]["codename"].title()
+
+            new_char = {
+                "key": key,
+                "name": char_dict[key]["name_en"],
+                "title": title
+            }
+
+            characters.append(new_char)
+
+        return characters
+
+
     @commands.command(aliases=['p5x'])
     async def persona5x(self, ctx):
         await ctx.defer()
 
         url = "https://lufel.net/"
 
-        characters = self.check_cache("p5x")
-        if not characters:
-            r = await self.bot.http_client.get(
-                f"{url}data/character_info.js")
-            temp_dict = r.text.split(
-                "Object.assign(window.characterData, ")[1].rsplit(
-                ");", 1)[0]
-            #temp_dict = "{\n" + temp_dict.replace(',\n    },', '\n    },')
-            #temp_dict = temp_dict.replace(',\n        },', '\n        },')
-            #temp_dict = temp_dict.replace('},\n\n    ', '},\n     ')
-
-            char_dict = json.loads(temp_dict)
-            characters = []
-            for key in list(char_dict.keys()):
-                if "persona3" in char_dict[key]:
-                    title = "S.E.E.S."
-                else:
-                    title = char_dict[key]["codename"].title()
-
-                new_char = {
-                    "key": key,
-                    "name": char_dict[key]["name_en"],
-                    "title": title
-                }
-                
-                characters.append(new_char)
-
-            self.write_cache("p5x", characters)
-
-        char = choice(characters)
+        char = await self.roster_pick("p5x")
 
         file = await self.url_to_file(
             f"{url}assets/img/character-detail/{char['key']}.webp",
@@ -1152,15 +1528,13 @@ class Gacha(commands.Cog,
 
         url = "https://genshin-impact.fandom.com/api.php"
 
-        page = await self.mediawiki_parse(url, "Wish/Gallery")
-
-        char = choice(page.xpath(("//div[@id='gallery-3']"
-            "/div[@class='wikia-gallery-item']")))
+        chars = await self.mediawiki_extract(url, "Wish/Gallery",
+            ("//div[@id='gallery-3']/div[@class='wikia-gallery-item']",
+            ".//div[@class='lightbox-caption']/a/text()",
+            ".//div[@class='thumb']/div/a/img/@data-image-name"))
+        self.index_images(url, [c[1] for c in chars])
 
-        char_name = char.xpath(
-            ".//div[@class='lightbox-caption']/a/text()")[0]
-        img = char.xpath(
-            ".//div[@class='thumb']/div/a/img/@data-image-name")[0]
+        char_name, img = choice(chars)
 
         file = await self.get_imageinfo(url, img)
 
@@ -1176,6 +1550,7 @@ class Gacha(commands.Cog,
             "Category:Playable_Characters", vignette=True)
 
         char = choice(char_list)
+        self.index_images(url, [c["pageimage"] for c in char_list])
 
         file = await self.get_imageinfo(url, char['pageimage'])
 
@@ -1191,6 +1566,7 @@ class Gacha(commands.Cog,
             "Category:Playable_Agents", vignette=True)
 
         char = choice(char_list)
+        self.index_images(url, [c["pageimage"] for c in char_list])
 
         file = await self.get_imageinfo(url, char['pageimage'])
 
@@ -1230,15 +1606,11 @@ class Gacha(commands.Cog,
         await ctx.defer()
         url = "https://finalfantasy.fandom.com/api.php"
 
-        page = await self.mediawiki_parse(url,
-            "Final Fantasy VII Ever Crisis gear")
-
-        skin = choice(page.xpath("//img[not(@alt='Userbox ff7-barret')]"))
-        char_name = skin.xpath(
-            "./ancestor::table/preceding::h3[1]/span/a/text()")[0]
-        char_title = skin.xpath("./ancestor::tr/td[2]/span/text()")[0]
-
-        img = skin.xpath("../@href")[0]
+        char_name, char_title, img = choice(await self.mediawiki_extract(url,
+            "Final Fantasy VII Ever Crisis gear",
+            ("//img[not(@alt='Userbox ff7-barret')]",
+            "./ancestor::table/preceding::h3[1]/span/a/text()",
+            "./ancestor::tr/td[2]/span/text()", "../@href")))
         file = await self.url_to_file(img)
 
         await self.post(ctx, file, "Final Fantasy VII: Ever Crisis", 0xe9d7b5,
@@ -1285,19 +1657,22 @@ class Gacha(commands.Cog,
         await self.post(ctx, file, "Food Fantasy", 0xf6be41, char, skin_name)
 
 
+    async def crawl_resosol(self):
+        url = "https://wiki.biligame.com/resonance/api.php"
+
+        characters = await self.mediawiki_category(url,
+            category="分类:乘员")
+
+        return characters
+
+
     @commands.command()
     async def resonancesolstice(self, ctx):
         await ctx.defer()
 
         url = "https://wiki.biligame.com/resonance/api.php"
 
-        characters = self.check_cache("resosol")
-        if not characters:
-            characters = await self.mediawiki_category(url,
-                category="分类:乘员")
-            self.write_cache("resosol", characters)
-
-        char = choice(characters)["title"]
+        char = (await self.roster_pick("resosol"))["title"]
 
         page = await self.mediawiki_parse(url, char)
         
@@ -1411,9 +1786,7 @@ class Gacha(commands.Cog,
         base_url = "https://endfield.wiki.gg"
         url = f"{base_url}/api.php"
 
-        page = await self.mediawiki_parse(url, "Operator/List")
-
-        char = choice(page.xpath(
+        char = choice(await self.mediawiki_extract(url, "Operator/List",
             "//div[@class='ranger-list']/div/div[2]/a/@title"))
 
         page = await self.mediawiki_parse(url, char)
@@ -1439,9 +1812,7 @@ class Gacha(commands.Cog,
         base_url = "https://grayravens.com"
         url = f"{base_url}/w/api.php"
 
-        page = await self.mediawiki_parse(url, "Characters")
-
-        char_name = choice(page.xpath(
+        char_name = choice(await self.mediawiki_extract(url, "Characters",
             "//table/tbody/tr/td[1]/small/a/text()"))
 
         page = await self.mediawiki_parse(url, f"{char_name}/Gallery")
@@ -1519,22 +1890,24 @@ class Gacha(commands.Cog,
         await self.post(ctx, file, "Mecharashi", 0xeddadb, char["RealName"])
 
 
-    @commands.command()
-    async def aethergazer(self, ctx):
-        await ctx.defer()
+    async def crawl_aethergazer(self):
         url = "https://mimir.cat"
 
-        characters = self.check_cache("aethergazer")
-        if not characters:
-            r = await self.bot.http_client.get(url)
-            page = html.fromstring(r.text)
+        r = await self.bot.http_client.get(url)
+        page = html.fromstring(r.text)
+
+        characters = page.xpath(
+            "//div[@class='character-grid']/a/@href")
+
+        return characters
 
-            characters = page.xpath(
-                "//div[@class='character-grid']/a/@href")
 
-            self.write_cache("aethergazer", characters)
+    @commands.command()
+    async def aethergazer(self, ctx):
+        await ctx.defer()
+        url = "https://mimir.cat"
 
-        char = choice(characters)
+        char = await self.roster_pick("aethergazer")
 
         r = await self.bot.http_client.get((f"{url}/_next/data/mimir"
             f"{char}profile.json"))
@@ -1598,20 +1971,18 @@ class Gacha(commands.Cog,
         await ctx.defer()
         url = "https://tales-of-the-rays.fandom.com/api.php"
 
-        page = await self.mediawiki_parse(url,
-            "Category:Playable_Character")
+        chars = await self.mediawiki_extract(url,
+            "Category:Playable_Character",
+            ("//tr", "./td[1]/a/text()", "./td[5]/text()",
+            "./td[2]/figure/span/img/@data-image-name"))
+        self.index_images(url,
+            [c[2].replace("-thumbnail-", "-portrait-") for c in chars])
 
-        chars = page.xpath("//tr")
-
-        char = choice(chars)
-        name = char.xpath("./td[1]/a/text()")[0]
-        game = char.xpath("./td[5]/text()")[0]
+        name, game, img = choice(chars)
         if game == "Tales of the Rays":
             game = ""
 
-        img = char.xpath(
-            "./td[2]/figure/span/img/@data-image-name")[0].replace(
-            "-thumbnail-", "-portrait-")
+        img = img.replace("-thumbnail-", "-portrait-")
 
         file = await self.get_imageinfo(url, img)
 
@@ -1630,28 +2001,30 @@ class Gacha(commands.Cog,
             game_short="xenoblade")
 
 
+    async def crawl_watcherofrealms(self):
+        url = "https://watcher-of-realms.fandom.com/api.php"
+
+        cat_list = [ "Category:Rare", "Category:Epic",
+            "Category:Legendary"]
+        chars = [{"title": "Gale"}, {"title": "Josh"}, {"title": "Lancer"},
+            {"title": "Lilia"}, {"title": "Arlow"}, {"title": "Cutter"},
+            {"title": "Halder"}, {"title": "Hayden"}, {"title": "Jonas"},
+            {"title": "Langlyn"}, {"title": "Liam"}, {"title": "Preter"},
+            {"title": "Rogers"}, {"title": "Rum-Nose"}, {"title": "Ryder"},
+            {"title": "Skreef"}, {"title": "Wagrak"}]
+        for cat in cat_list:
+             char_list = await self.mediawiki_category(url, cat)
+             chars.extend(char_list)
+
+        return chars
+
+
     @commands.command()
     async def watcherofrealms(self, ctx):
         await ctx.defer()
         url = "https://watcher-of-realms.fandom.com/api.php"
 
-        chars = self.check_cache("watcherofrealms")
-        if not chars:
-            cat_list = [ "Category:Rare", "Category:Epic",
-                "Category:Legendary"]
-            chars = [{"title": "Gale"}, {"title": "Josh"}, {"title": "Lancer"},
-                {"title": "Lilia"}, {"title": "Arlow"}, {"title": "Cutter"},
-                {"title": "Halder"}, {"title": "Hayden"}, {"title": "Jonas"},
-                {"title": "Langlyn"}, {"title": "Liam"}, {"title": "Preter"},
-                {"title": "Rogers"}, {"title": "Rum-Nose"}, {"title": "Ryder"},
-                {"title": "Skreef"}, {"title": "Wagrak"}]
-            for cat in cat_list:
-                 char_list = await self.mediawiki_category(url, cat)
-                 chars.extend(char_list)
-
-            self.write_cache("watcherofrealms", chars)
-
-        char = choice(chars)["title"]
+        char = (await self.roster_pick("watcherofrealms"))["title"]
         page = await self.mediawiki_parse(url, char)
 
         title = ""
@@ -1737,58 +2110,57 @@ class Gacha(commands.Cog,
         await ctx.defer()
         url = "https://tribeninegame.fandom.com/api.php"
 
-        page = await self.mediawiki_parse(url, "Characters")
-        chars = []
-        for i in range(0,2):
-            chars.extend(page.xpath(
-                f"//div[@id='gallery-{i}']/div[@class='wikia-gallery-item']"))
-
-        char = choice(chars)
-        char_name = char.xpath("./div[2]/center/a/text()")[0]
+        chars = await self.mediawiki_extract(url, "Characters",
+            ("//div[@id='gallery-0' or @id='gallery-1']"
+            "/div[@class='wikia-gallery-item']",
+            "./div[2]/center/a/text()", "./div[1]//img/@data-image-name"))
+        self.index_images(url, [c[1] for c in chars])
 
-        img = char.xpath("./div[1]//img/@data-image-name")[0]
+        char_name, img = choice(chars)
         file = await self.get_imageinfo(url, img)
 
         await self.post(ctx, file, "Tribe Nine", 0x0269ef, char_name)
 
 
+    async def crawl_mahjongsoul(self):
+        url = "https://files.riichi.moe/"
+
+        js = {
+            "n": 1000,
+            "q": ("path like *Mahjong* and path like *Soul* and"
+                " path like *portraits* and name like *full.png*")
+        }
+        r = await self.bot.http_client.post(f"{url}?srch=", json=js,
+            headers=self.headers)
+        file_list = r.json()["hits"]
+
+        chars = {}
+        for f in file_list:
+            f_name = f["rp"]
+
+            bad_folders = ["/reverse/", "/C.C/",
+                "/Freed%20Jyanshi", "/sataen"]
+            if not any(x in f_name for x in bad_folders):
+                f_name = f_name.split("/portraits/")[1].rsplit("/full")[0]
+                print(f_name)
+                try:
+                    char, title = unquote(f_name).split("/")
+                except:
+                    char = unquote(f_name)
+                    title = ""
+                chars.setdefault(char, [])
+                chars[char].append(title)
+
+        return [list(c) for c in chars.items()]
+
+
     @commands.command()
     async def mahjongsoul(self, ctx):
         await ctx.defer()
         url = "https://files.riichi.moe/"
 
-        chars = self.check_cache("mahjongsoul")
-        if not chars:
-            js = {
-                "n": 1000,
-                "q": ("path like *Mahjong* and path like *Soul* and"
-                    " path like *portraits* and name like *full.png*")
-            }
-            r = await self.bot.http_client.post(f"{url}?srch=", json=js,
-                headers=self.headers)
-            file_list = r.json()["hits"]
-
-            chars = {}
-            for f in file_list:
-                f_name = f["rp"]
-
-                bad_folders = ["/reverse/", "/C.C/",
-                    "/Freed%20Jyanshi", "/sataen"]
-                if not any(x in f_name for x in bad_folders):
-                    f_name = f_name.split("/portraits/")[1].rsplit("/full")[0]
-                    print(f_name)
-                    try:
-                        char, title = unquote(f_name).split("/")
-                    except:
-                        char = unquote(f_name)
-                        title = ""
-                    chars.setdefault(char, [])
-                    chars[char].append(title)
-
-            self.write_cache("mahjongsoul", chars)
-
-        char = choice(list(chars.keys()))
-        title = choice(chars[char])
+        char, titles = await self.roster_pick("mahjongsoul")
+        title = choice(titles)
 
         img_url = (f"{url}mjg/game resources and tools/Mahjong Soul/"
             f"game files/portraits/{char}{'/' if title else ''}{title}/full.png")
@@ -1839,11 +2211,11 @@ class Gacha(commands.Cog,
         await ctx.defer()
         url = "https://monster-strike-enjp.fandom.com/api.php"
 
-        pedia_page = await self.mediawiki_parse(url, "Monsterpedia")
-        pedia_num = choice(pedia_page.xpath("//table//td/a/@title"))
+        pedia_num = choice(await self.mediawiki_extract(url, "Monsterpedia",
+            "//table//td/a/@title"))
 
-        list_page = await self.mediawiki_parse(url, pedia_num)
-        char_page = choice(list_page.xpath("//table//td/a/@title"))
+        char_page = choice(await self.mediawiki_extract(url, pedia_num,
+            "//table//td/a/@title"))
         
         page = await self.mediawiki_parse(url, char_page)
         variant = choice(page.xpath("//table[@border='1']"))
@@ -1872,6 +2244,16 @@ class Gacha(commands.Cog,
         await self.post(ctx, file, "Monster Strike", 0xde630b, name, title)
 
 
+    async def crawl_gfl(self):
+        base_url = "https://iopwiki.com"
+        url = f"{base_url}/api.php"
+
+        chars = await self.mediawiki_category(url,
+            "Category:T-Dolls")
+
+        return chars
+
+
     @commands.command(aliases=['gfl'])
     async def girlsfrontline(self, ctx):
         await ctx.defer()
@@ -1879,14 +2261,7 @@ class Gacha(commands.Cog,
         base_url = "https://iopwiki.com"
         url = f"{base_url}/api.php"
 
-        chars = check_cache("gfl")
-        if not chars:
-            chars = await self.mediawiki_category(url,
-                "Category:T-Dolls")
-
-            self.write_cache("gfl", chars)
-
-        char = choice(chars)["title"]
+        char = (await self.roster_pick("gfl"))["title"]
 
         page = await self.mediawiki_parse(url, char)
         skins = page.xpath("//ul[starts-with(@class, 'gallery')][1]/li")
@@ -1914,6 +2289,16 @@ class Gacha(commands.Cog,
             char, title, game_short="girls frontline")
 
 
+    async def crawl_gfl2(self):
+        base_url = "https://iopwiki.com"
+        url = f"{base_url}/api.php"
+
+        chars = await self.mediawiki_category(url,
+            "Category:GFL2 Dolls")
+
+        return chars
+
+
     @commands.command(aliases=["gfl2"])
     async def gflexilium(self, ctx):
         await ctx.defer()
@@ -1921,14 +2306,7 @@ class Gacha(commands.Cog,
         base_url = "https://iopwiki.com"
         url = f"{base_url}/api.php"
 
-        chars = check_cache("gfl2")
-        if not chars:
-            chars = await self.mediawiki_category(url,
-                "Category:GFL2 Dolls")
-
-            self.write_cache("gfl2", chars)
-
-        char = choice(chars)["title"]
+        char = (await self.roster_pick("gfl2"))["title"]
         char_name = char.replace(" (GFL2)", "")
 
         page = await self.mediawiki_parse(url, char)
@@ -2174,4 +2552,12 @@ class Gacha(commands.Cog,
 
 
 async def setup(bot):
+    await create_cache_table(bot.db)
+    await bot.db.execute("""CREATE TABLE IF NOT EXISTS gacha_rosters
+        (game text PRIMARY KEY, updated timestamp with time zone,
+        size integer)""")
+    await bot.db.execute("""CREATE TABLE IF NOT EXISTS gacha_characters
+        (game text, idx integer, data text, PRIMARY KEY(game, idx))""")
+    await bot.db.execute("""CREATE TABLE IF NOT EXISTS gacha_bad_pages
+        (game text, pageid integer, UNIQUE(game, pageid))""")
     await bot.add_cog(Gacha(bot))
\ No newline at end of file
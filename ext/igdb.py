@@ -6,12 +6,12 @@ import aiosqlite
 from datetime import datetime
 import time
 from random import randint, choice
-from PIL import Image
 from io import BytesIO
 
 import traceback
 import sys
 
+from ext.util.imagecache import ImageCache
 from ext.util.twitchauth import twitch_auth
 from credentials import TWITCH_ID, TWITCH_SECRET, ERROR_CHANNEL, DEBUG_CHANNEL
 
@@ -98,13 +98,14 @@ class IGDB(commands.Cog):
 
         if img_url:
             img_url = img_url.lstrip("/")
-            r = await self.bot.http_client.get(img_url)
-            box_img = Image.open(BytesIO(r.content))
-
-            with BytesIO() as img_binary:
-                box_img.save(img_binary, "WebP")
-                img_binary.seek(0)
-                file = discord.File(fp=img_binary, filename="playing.webp")
+            key = ImageCache.key(img_url, "WebP")
+            box_img = await self.bot.image_cache.get(key)
+            if box_img is None:
+                r = await self.bot.http_client.get(img_url)
+                box_img = await self.bot.image_pool.process(r.content,
+                    img_format="WebP")
+                await self.bot.image_cache.put(key, box_img)
+            file = discord.File(fp=BytesIO(box_img), filename="playing.webp")
 
             embed.set_image(url="attachment://playing.webp")
 
@@ -4,19 +4,83 @@ from discord import app_commands
 
 from geopy.adapters import AioHTTPAdapter
 from geopy.geocoders import Nominatim
-import geopandas
-from random import randint, choices, sample
-from PIL import Image
+from random import randint, sample, random, choice, uniform
+from math import ceil
+import asyncio
 from io import BytesIO
 import json
 from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
 
+from ext.util import geohash
+from ext.util.cache import PersistentCache, create_cache_table
+from ext.util.geometry import SamplingArea
+from ext.util.sampling import AliasTable
 from credentials import GMAPS_KEY
 
 class StreetView(commands.Cog):
 
+	gmaps_url = "https://maps.googleapis.com/maps/api"
+	# Candidate points are drawn in batches sized from each place's hit rate
+	# so about one should have coverage, and probed this many at a time
+	min_batch = 1
+	max_batch = 32
+	probe_concurrency = 8
+	# Hits are bucketed into geohash cells of this precision, candidates
+	# come from known cells except for this fraction of uniform samples
+	cell_precision = 5
+	fresh_rate = 0.2
+	# Longest substring the autocomplete index keys names by
+	index_depth = 8
+	# Decimal places coordinates are rounded to for reusing addresses,
+	# 3 is about 100m
+	address_precision = 3
+
 	def __init__(self, bot):
 		self.bot = bot
+		self.polygon_cache = PersistentCache(bot.db, "nominatim_polygon")
+		self.polygons = {}
+		# Shapely releases the GIL for its array work, threads are enough
+		self.geometry_pool = ThreadPoolExecutor(max_workers=2)
+		self.hit_rates = PersistentCache(bot.db, "streetview_hit_rate")
+		self.cells = {}
+		self.addresses = PersistentCache(bot.db, "nominatim_reverse")
+		self.geolocator = Nominatim(
+			user_agent="battlebutt",
+			adapter_factory=AioHTTPAdapter,
+			timeout=20)
+
+		# Weighted pickers and name lookups, built once
+		self.country_table = AliasTable(*zip(*self.gmaps_countries))
+		self.region_tables = {country: AliasTable(*zip(*regions))
+			for country, regions in self.gmaps_regions.items()}
+		self.country_names = {name.lower(): name
+			for name, weight in self.gmaps_countries}
+		self.country_choices = [app_commands.Choice(name=name, value=name)
+			for name in self.country_names.values()]
+
+		# Every substring of a name up to index_depth long -> names
+		self.name_index = {}
+		for option in self.country_choices:
+			lower = option.name.lower()
+			for start in range(len(lower)):
+				for end in range(start + 1,
+					min(len(lower), start + self.index_depth) + 1):
+					names = self.name_index.setdefault(lower[start:end], [])
+					if not names or names[-1] is not option:
+						names.append(option)
+
+	async def cog_load(self):
+		# One session for the cog's lifetime rather than one per lookup
+		await self.geolocator.__aenter__()
+
+	async def cog_unload(self):
+		await self.geolocator.__aexit__(None, None, None)
+		self.geometry_pool.shutdown(wait=False, cancel_futures=True)
+
+	async def run_geometry(self, func, *args):
+		return await asyncio.get_running_loop().run_in_executor(
+			self.geometry_pool, func, *args)
 
 	gmaps_countries = [
 		("Albania",25000),
@@ -338,11 +402,11 @@ class StreetView(commands.Cog):
 		await interaction.response.defer()
 
 		radius = 5000
-		countries = [x[0].lower() for x in self.gmaps_countries]
-		if not country or country.lower() not in countries:
+		if country and country.lower() in self.country_names:
+			country = self.country_names[country.lower()]
+		else:
 			# Get random country, weighted roughly by area and coverage
-			weights = [x[1] for x in self.gmaps_countries]
-			country = choices(countries, weights)[0]
+			country = self.country_table.pick()
 			radius = 499999
 
 		if country == "Macau" or country == "Hong Kong":
@@ -352,89 +416,198 @@ class StreetView(commands.Cog):
 			query = {"country": country}
 
 		# Filter down some larger countries to bias towards coverage
-		if country in self.gmaps_regions:
-			regions = [x[0] for x in self.gmaps_regions[country]]
-			weights = [x[1] for x in self.gmaps_regions[country]]
-			region = choices(regions, weights)[0]
-			query["state"] = region
+		if country in self.region_tables:
+			query["state"] = self.region_tables[country].pick()
 
 		# Get polygon of country from OSM
-		async with Nominatim(
-			user_agent="battlebutt",
-			adapter_factory=AioHTTPAdapter,
-			timeout=20
-		) as geolocator:
-			loc = await geolocator.geocode(
-				query=query,
-				language="en",
-				geometry="geojson")
-			poly = geopandas.read_file(json.dumps(loc.raw["geojson"]))
-
-		# Generate random point in country, check coverage exists within 500km
-		valid_point = False
-		while not valid_point:
-			rand_point = poly.sample_points(1)
-
-			gmaps_url = "https://maps.googleapis.com/maps/api"
-			strview_params = {
-				"key": GMAPS_KEY,
-				"location": f"{rand_point.y[0]},{rand_point.x[0]}",
-				"size": "640x480",
-				"radius": radius,
-				"heading": randint(0,359),
-				"pitch": randint(0,20),
-				"source": "outdoor"
-			}
-			r = await self.bot.http_client.get(
-				url=f"{gmaps_url}/streetview/metadata",
-				params=strview_params)
-			try:
-				metadata = r.json()["location"]
-				coords = f"{metadata['lat']},{metadata['lng']}"
-				valid_point = True
-			except:
-				pass
+		poly = await self.polygon(query)
+
+		# Generate random points in country, take the first with coverage
+		metadata = await self.find_coverage(
+			json.dumps(query, sort_keys=True), poly, radius)
+		coords = f"{metadata['location']['lat']},{metadata['location']['lng']}"
+		strview_params = {
+			"key": GMAPS_KEY,
+			"pano": metadata["pano_id"],
+			"size": "640x480",
+			"heading": randint(0,359),
+			"pitch": randint(0,20)
+		}
 
 		# Reverse geocode an address from coverage spot
-		async with Nominatim(
-			user_agent="battlebutt",
-			adapter_factory=AioHTTPAdapter,
-			timeout=20
-		) as geolocator:
-			loc = await geolocator.reverse(coords, language="en", zoom=17)
-			address = loc.address
+		address = await self.address(metadata["location"]["lat"],
+			metadata["location"]["lng"])
 
-		# Get image, post
+		# Get image, post. Heading and pitch are random so the same view
+		# rarely comes up twice, not worth a place in the image cache
 		r = await self.bot.http_client.get(
-			url=f"{gmaps_url}/streetview",
+			url=f"{self.gmaps_url}/streetview",
 			params=strview_params)
-		strview_img = Image.open(BytesIO(r.content))
-
-		with BytesIO() as img_binary:
-			strview_img.save(img_binary, 'PNG')
-			img_binary.seek(0)
-			nl = "\n"
-			await interaction.followup.send(
-				f"{f'{reason}:{nl}' if reason else ''}[{address}](<https://google.com/maps/place/{coords}>)",
-				file=discord.File(
-					fp=img_binary,
-					filename="streetview.png"))
+		strview_img = await self.bot.image_pool.process(r.content,
+			img_format="PNG")
+
+		nl = "\n"
+		await interaction.followup.send(
+			f"{f'{reason}:{nl}' if reason else ''}[{address}](<https://google.com/maps/place/{coords}>)",
+			file=discord.File(
+				fp=BytesIO(strview_img),
+				filename="streetview.png"))
+
+	async def find_coverage(self, place: str, poly, radius: int):
+		"""Metadata of the first Street View hit among batches of random
+		points in poly, probed concurrently. Probes still running once
+		one hits are cancelled, the rest feed the place's hit rate."""
+
+		key = f"{place} {radius}"
+		entry = await self.hit_rates.get(key)
+		hits, tries = entry.data if entry else (0, 0)
+		slots = asyncio.Semaphore(self.probe_concurrency)
+
+		async def probe(lat, lng):
+			# A failed request is just a miss, like any other point
+			try:
+				async with slots:
+					r = await self.bot.http_client.get(
+						url=f"{self.gmaps_url}/streetview/metadata",
+						params={
+							"key": GMAPS_KEY,
+							"location": f"{lat},{lng}",
+							"radius": radius,
+							"source": "outdoor"
+						})
+					j = r.json()
+			except Exception:
+				return None
+			return j if "location" in j else None
+
+		try:
+			while True:
+				# Laplace smoothed, so unseen places start at 50%
+				rate = (hits + 1) / (tries + 2)
+				k = max(self.min_batch, min(self.max_batch, ceil(1 / rate)))
+				points = await self.candidates(place, poly, k)
+
+				probes = [asyncio.create_task(probe(lat, lng))
+					for lat, lng in points]
+				try:
+					for done in asyncio.as_completed(probes):
+						metadata = await done
+						tries += 1
+						if metadata:
+							hits += 1
+							await self.record_hit(place, poly, metadata)
+							return metadata
+				finally:
+					for p in probes:
+						p.cancel()
+					await asyncio.gather(*probes, return_exceptions=True)
+		finally:
+			await self.hit_rates.set(key, [hits, tries])
+
+	async def candidates(self, place: str, poly, k: int):
+		"""k (lat, lng) points to probe, mostly inside cells that have had
+		coverage before and the rest uniform over the polygon"""
+
+		cells = await self.known_cells(place, poly)
+		fresh = k if not cells else sum(random() < self.fresh_rate
+			for i in range(k))
+
+		points = []
+		for i in range(k - fresh):
+			lat_min, lat_max, lng_min, lng_max = geohash.bounds(choice(cells))
+			points.append((uniform(lat_min, lat_max), uniform(lng_min, lng_max)))
+		if fresh:
+			points += await self.run_geometry(poly.sample, fresh)
+
+		return points
+
+	async def known_cells(self, place: str, poly):
+		"""Cells of the place's past hits, leaving out any hit that landed
+		outside its boundary"""
+
+		if place not in self.cells:
+			rows = await self.bot.db.fetch("""SELECT lat, lng, cell
+				FROM streetview_hits WHERE place=$1""", place)
+			self.cells[place] = list({row["cell"] for row in rows
+				if poly.contains(row["lat"], row["lng"])})
+
+		return self.cells[place]
+
+	async def record_hit(self, place: str, poly, metadata: dict):
+		"""Remembers a hit's cell for the place. Wide radius probes can
+		return panos well outside it, those aren't kept."""
+
+		lat = metadata["location"]["lat"]
+		lng = metadata["location"]["lng"]
+		if not poly.contains(lat, lng):
+			return
+		cell = geohash.encode(lat, lng, self.cell_precision)
+
+		await self.bot.db.execute("""INSERT INTO streetview_hits
+			VALUES ($1, $2, $3, $4, $5) ON CONFLICT DO NOTHING""",
+			place, metadata["pano_id"], lat, lng, cell)
+		cells = await self.known_cells(place, poly)
+		if cell not in cells:
+			cells.append(cell)
+
+	async def address(self, lat: float, lng: float):
+		"""Street level address of a point, shared by nearby points"""
+
+		key = (f"{round(lat, self.address_precision)},"
+			f"{round(lng, self.address_precision)}")
+		entry = await self.addresses.get(key)
+		if not entry:
+			loc = await self.geolocator.reverse(f"{lat},{lng}",
+				language="en", zoom=17)
+			entry = await self.addresses.set(key, loc.address)
+
+		return entry.data
+
+	async def polygon(self, query: dict):
+		"""Boundary of a Nominatim query, geocoded once and kept as WKB,
+		then simplified and prepared for sampling off the event loop"""
+
+		key = json.dumps(query, sort_keys=True)
+		if key in self.polygons:
+			return self.polygons[key]
+
+		entry = await self.polygon_cache.get(key)
+		if entry:
+			area = await self.run_geometry(SamplingArea.from_wkb, entry.data)
+		else:
+			loc = await self.geolocator.geocode(
+				query=query,
+				language="en",
+				geometry="geojson")
+			area = await self.run_geometry(SamplingArea.from_geojson,
+				loc.raw["geojson"])
+			await self.polygon_cache.set(key,
+				await self.run_geometry(area.to_wkb))
+
+		self.polygons[key] = area
+		return area
 
 	@streetview.autocomplete('country')
 	async def streetview_autocomplete(self,
 		interaction: discord.Interaction,
 		current: str,) -> list[app_commands.Choice[str]]:
 
-		completes = [app_commands.Choice(name=country[0], value=country[0])
-			for country in self.gmaps_countries
-			if current.lower() in country[0].lower()]
 		if not current:
-			completes = sample(completes, 25)
+			return sample(self.country_choices, 25)
+
+		current = current.lower()
+		completes = self.name_index.get(current[:self.index_depth], [])
+		if len(current) > self.index_depth:
+			completes = [c for c in completes if current in c.name.lower()]
 
 		return completes[:25]
 
 
 async def setup(bot):
+	await create_cache_table(bot.db)
+	await bot.db.execute("""CREATE TABLE IF NOT EXISTS streetview_hits
+		(place text, pano text, lat double precision, lng double precision,
+		cell text, PRIMARY KEY(place, pano))""")
 	await bot.add_cog(StreetView(bot))
 
 async def teardown(bot):
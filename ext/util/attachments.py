@@ -0,0 +1,47 @@
+import time
+from urllib.parse import parse_qs, urlparse
+
+import discord
+
+from ext.util.cache import PersistentCache
+
+
+class CachedFile(discord.File):
+    """discord.File that knows which image cache entry it was made from"""
+
+    def __init__(self, fp, filename: str = None, *, cache_key: str = None,
+        **kwargs):
+        super().__init__(fp, filename, **kwargs)
+        self.cache_key = cache_key
+
+
+class AttachmentCache:
+    """Discord CDN urls of images that have already been uploaded, by image
+    cache key. Signed urls are dropped margin seconds before their ex=
+    expiry, the next upload of that image stores a new one."""
+
+    def __init__(self, db, margin: int = 3600):
+        self.urls = PersistentCache(db, "discord_attachment")
+        self.margin = margin
+
+    @staticmethod
+    def expires(url: str):
+        ex = parse_qs(urlparse(url).query).get("ex")
+        return int(ex[0], 16) if ex else None
+
+
+    async def get(self, key: str):
+        entry = await self.urls.get(key)
+        if not entry:
+            return None
+
+        expires = self.expires(entry.data)
+        if expires and expires - self.margin < time.time():
+            await self.urls.delete(key)
+            return None
+
+        return entry.data
+
+
+    async def set(self, key: str, url: str):
+        await self.urls.set(key, url)
@@ -0,0 +1,131 @@
+import json
+from datetime import datetime, timedelta, timezone
+
+import credentials
+
+# Directory for caches kept on disk rather than in the database
+CACHE_DIR = getattr(credentials, "CACHE_DIR", "cache")
+
+
+async def create_cache_table(db):
+    await db.execute("""CREATE TABLE IF NOT EXISTS cache_store
+        (namespace text, key text, data text, etag text, last_modified text,
+        updated timestamp with time zone, PRIMARY KEY(namespace, key))""")
+
+
+class CacheEntry:
+
+    def __init__(self, data, etag: str = None, last_modified: str = None,
+        updated: datetime = None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.updated = updated or datetime.now(timezone.utc)
+
+    def validators(self):
+        """Headers to make a conditional request for this entry"""
+
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+
+        return headers
+
+
+class PersistentCache:
+    """JSON values kept in the cache_store table under a namespace, and in
+    memory once read. Entries older than ttl aren't fresh but are still
+    returned, so they can be revalidated or served stale."""
+
+    def __init__(self, db, namespace: str, ttl: timedelta = None):
+        self.db = db
+        self.namespace = namespace
+        self.ttl = ttl
+        self.entries = {}
+
+    def fresh(self, entry: CacheEntry):
+        if not entry:
+            return False
+        if not self.ttl:
+            return True
+
+        return datetime.now(timezone.utc) - entry.updated < self.ttl
+
+
+    async def get(self, key: str):
+        if key not in self.entries:
+            row = await self.db.fetchrow("""SELECT data, etag, last_modified,
+                updated FROM cache_store WHERE namespace=$1 AND key=$2""",
+                self.namespace, key)
+            if not row:
+                return None
+
+            self.entries[key] = CacheEntry(json.loads(row["data"]),
+                row["etag"], row["last_modified"], row["updated"])
+
+        return self.entries[key]
+
+
+    async def get_many(self, keys: list):
+        """Entries for every key that has one, in one query for the keys
+        that aren't in memory yet"""
+
+        cold = [k for k in keys if k not in self.entries]
+        if cold:
+            rows = await self.db.fetch("""SELECT key, data, etag,
+                last_modified, updated FROM cache_store
+                WHERE namespace=$1 AND key=ANY($2::text[])""",
+                self.namespace, cold)
+            for row in rows:
+                self.entries[row["key"]] = CacheEntry(json.loads(row["data"]),
+                    row["etag"], row["last_modified"], row["updated"])
+
+        return {k: self.entries[k] for k in keys if k in self.entries}
+
+
+    async def set(self, key: str, data, etag: str = None,
+        last_modified: str = None):
+
+        entry = CacheEntry(data, etag, last_modified)
+        await self.db.execute("""INSERT INTO cache_store
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (namespace, key) DO UPDATE
+            SET data=$3, etag=$4, last_modified=$5, updated=$6""",
+            self.namespace, key, json.dumps(data), etag, last_modified,
+            entry.updated)
+        self.entries[key] = entry
+
+        return entry
+
+
+    async def set_many(self, items: dict):
+        """Stores several keys' data at once, without validators"""
+
+        entries = {k: CacheEntry(data) for k, data in items.items()}
+        await self.db.executemany("""INSERT INTO cache_store
+            VALUES ($1, $2, $3, NULL, NULL, $4)
+            ON CONFLICT (namespace, key) DO UPDATE
+            SET data=$3, etag=NULL, last_modified=NULL, updated=$4""",
+            [(self.namespace, k, json.dumps(e.data), e.updated)
+                for k, e in entries.items()])
+        self.entries.update(entries)
+
+
+    async def delete(self, key: str):
+        self.entries.pop(key, None)
+        await self.db.execute("""DELETE FROM cache_store
+            WHERE namespace=$1 AND key=$2""", self.namespace, key)
+
+
+    async def touch(self, key: str):
+        """Marks an entry fresh again, e.g. after a 304"""
+
+        entry = self.entries[key]
+        entry.updated = datetime.now(timezone.utc)
+        await self.db.execute("""UPDATE cache_store SET updated=$3
+            WHERE namespace=$1 AND key=$2""",
+            self.namespace, key, entry.updated)
+
+        return entry
@@ -0,0 +1,22 @@
+import os
+
+
+class DataFile:
+    """A data file parsed once and kept in memory, parsed again whenever
+    its mtime changes so edits are picked up without reloading the cog"""
+
+    def __init__(self, path: str, parse):
+        self.path = path
+        self.parse = parse
+        self.mtime = None
+        self.data = None
+        self.get()
+
+    def get(self):
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self.mtime:
+            with open(self.path, encoding="utf-8") as f:
+                self.data = self.parse(f)
+            self.mtime = mtime
+
+        return self.data
@@ -0,0 +1,45 @@
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def encode(lat: float, lng: float, precision: int = 5):
+    """Geohash of a point, precision 5 cells are roughly 5km across"""
+
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    cell = []
+    bits, bit_count, even = 0, 0, True
+    while len(cell) < precision:
+        value, bounds = (lng, lng_range) if even else (lat, lat_range)
+        mid = (bounds[0] + bounds[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            bounds[0] = mid
+        else:
+            bounds[1] = mid
+        even = not even
+
+        bit_count += 1
+        if bit_count == 5:
+            cell.append(BASE32[bits])
+            bits, bit_count = 0, 0
+
+    return "".join(cell)
+
+
+def bounds(cell: str):
+    """(min lat, max lat, min lng, max lng) covered by a geohash"""
+
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        bits = BASE32.index(char)
+        for shift in range(4, -1, -1):
+            target = lng_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bits >> shift & 1:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lat_range[0], lat_range[1], lng_range[0], lng_range[1]
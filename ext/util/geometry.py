@@ -0,0 +1,60 @@
+from math import ceil
+
+import numpy
+import shapely
+from shapely.geometry import shape
+
+
+class SamplingArea:
+    """A boundary simplified and prepared once, so drawing random points in
+    it is array math. Both building and sampling are CPU bound, run them in
+    an executor for big multipolygons."""
+
+    def __init__(self, geom, tolerance: float = 0.01):
+        # 0.01 degrees is around 1km, far finer than coverage probes need
+        geom = shapely.simplify(geom, tolerance, preserve_topology=True)
+        shapely.prepare(geom)
+        self.geom = geom
+        self.bounds = geom.bounds
+
+        # Share of the bounding box inside the boundary, so batches of
+        # candidates can be sized to usually need one pass
+        min_x, min_y, max_x, max_y = self.bounds
+        box_area = (max_x - min_x) * (max_y - min_y)
+        self.fill = max(geom.area / box_area, 0.01) if box_area else 1.0
+
+    @classmethod
+    def from_wkb(cls, wkb):
+        return cls(shapely.from_wkb(wkb))
+
+    @classmethod
+    def from_geojson(cls, geojson: dict):
+        return cls(shape(geojson))
+
+    def to_wkb(self):
+        return shapely.to_wkb(self.geom, hex=True)
+
+    def contains(self, lat, lng):
+        """Whether points are inside the boundary, for scalars or arrays"""
+
+        return shapely.contains_xy(self.geom, lng, lat)
+
+    def sample(self, k: int):
+        """k uniformly random (lat, lng) points inside the boundary"""
+
+        # Points and lines have nothing to sample inside, use their centre
+        if not self.geom.area:
+            centre = self.geom.centroid
+            return [(centre.y, centre.x)] * k
+
+        rng = numpy.random.default_rng()
+        min_x, min_y, max_x, max_y = self.bounds
+        points = []
+        while len(points) < k:
+            n = ceil((k - len(points)) / self.fill * 1.2)
+            xs = rng.uniform(min_x, max_x, n)
+            ys = rng.uniform(min_y, max_y, n)
+            inside = shapely.contains_xy(self.geom, xs, ys)
+            points += zip(ys[inside].tolist(), xs[inside].tolist())
+
+        return points[:k]
@@ -0,0 +1,53 @@
+from datetime import timedelta
+
+from ext.util.cache import PersistentCache
+from ext.util.imagepool import fetch_image
+
+
+class GitHubCache:
+    """Git trees and blobs from the GitHub API. Tree listings are kept in
+    the cache store and revalidated by ETag. Blobs aren't stored here,
+    callers keep what they make from them in the image cache by SHA."""
+
+    api = "https://api.github.com/repos"
+
+    def __init__(self, db, http_client, token: str = None,
+        tree_ttl: timedelta = timedelta(hours=1)):
+        self.http_client = http_client
+        self.trees = PersistentCache(db, "github_tree", tree_ttl)
+        self.headers = {}
+        if token:
+            self.headers["Authorization"] = f"Bearer {token}"
+
+    async def tree(self, repo: str, tree: str):
+        """Entries of a tree, only re-listed when GitHub says it changed"""
+
+        key = f"{repo} {tree}"
+        entry = await self.trees.get(key)
+        if self.trees.fresh(entry):
+            return entry.data
+
+        headers = dict(self.headers)
+        if entry:
+            headers.update(entry.validators())
+
+        r = await self.http_client.get(f"{self.api}/{repo}/git/trees/{tree}",
+            headers=headers)
+        if r.status_code == 304:
+            return (await self.trees.touch(key)).data
+        r.raise_for_status()
+
+        entry = await self.trees.set(key, r.json()["tree"],
+            r.headers.get("ETag"), r.headers.get("Last-Modified"))
+
+        return entry.data
+
+
+    async def blob(self, repo: str, sha: str):
+        """Raw bytes of a blob, streamed through fetch_image's checks"""
+
+        headers = dict(self.headers)
+        headers["Accept"] = "application/vnd.github.raw+json"
+
+        return await fetch_image(self.http_client,
+            f"{self.api}/{repo}/git/blobs/{sha}", headers=headers)
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import os
+import secrets
+from collections import OrderedDict
+
+import credentials
+from ext.util.cache import CACHE_DIR
+
+# Size the image cache is trimmed back to, in megabytes
+IMAGE_CACHE_MB = getattr(credentials, "IMAGE_CACHE_MB", 512)
+
+
+class ImageCache:
+    """Finished image bytes on disk, keyed by a hash of where they came from
+    and how they were processed. Least recently used files go first once
+    the cache is over max_bytes, file mtimes keep that order over restarts.
+    Disk access runs in a thread, the index is only touched on the loop."""
+
+    def __init__(self, path: str = os.path.join(CACHE_DIR, "images"),
+        max_bytes: int = IMAGE_CACHE_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.files = OrderedDict()
+        self.size = 0
+
+        os.makedirs(path, exist_ok=True)
+        found = []
+        for entry in os.scandir(path):
+            if entry.name.endswith(".part"):
+                os.remove(entry.path)
+                continue
+            stat = entry.stat()
+            found.append((stat.st_mtime, entry.name, stat.st_size))
+
+        for mtime, name, size in sorted(found):
+            self.files[name] = size
+            self.size += size
+        self.remove(self.evicted())
+
+    @staticmethod
+    def key(*parts):
+        """Cache key for a source (url, sha, id...) and processing options"""
+
+        return hashlib.sha256(
+            " ".join(str(p) for p in parts).encode()).hexdigest()
+
+
+    @staticmethod
+    def read(path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)
+        return data
+
+    @staticmethod
+    def write(path: str, data: bytes):
+        # Unique temp name so two puts of one key can't clobber each other
+        part = f"{path}.{secrets.token_hex(4)}.part"
+        with open(part, "wb") as f:
+            f.write(data)
+        os.replace(part, path)
+
+    @staticmethod
+    def remove(paths: list):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+    async def get(self, key: str):
+        if key not in self.files:
+            return None
+
+        try:
+            data = await asyncio.to_thread(
+                self.read, os.path.join(self.path, key))
+        except FileNotFoundError:
+            self.size -= self.files.pop(key, 0)
+            return None
+
+        if key in self.files:
+            self.files.move_to_end(key)
+
+        return data
+
+
+    async def put(self, key: str, data: bytes):
+        await asyncio.to_thread(
+            self.write, os.path.join(self.path, key), data)
+
+        self.size -= self.files.pop(key, 0)
+        self.files[key] = len(data)
+        self.size += len(data)
+
+        evicted = self.evicted()
+        if evicted:
+            await asyncio.to_thread(self.remove, evicted)
+
+
+    def evicted(self):
+        """Drops least recently used keys until under max_bytes, returning
+        the paths of their files"""
+
+        paths = []
+        while self.size > self.max_bytes and self.files:
+            key, size = self.files.popitem(last=False)
+            self.size -= size
+            paths.append(os.path.join(self.path, key))
+
+        return paths
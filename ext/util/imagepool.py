@@ -0,0 +1,168 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from PIL import Image, ImageFile
+
+import credentials
+
+# Worker processes and how many extra jobs may wait for one before callers
+# are made to wait their turn
+IMAGE_WORKERS = getattr(credentials, "IMAGE_WORKERS", 2)
+IMAGE_QUEUE = getattr(credentials, "IMAGE_QUEUE", 8)
+# Largest image download accepted, in megabytes
+IMAGE_MAX_MB = getattr(credentials, "IMAGE_MAX_MB", 20)
+# How much of a download PIL is given to find the image size in. Some
+# formats, WebP among them, can't be measured until they're complete, the
+# worker checks those.
+SNIFF_BYTES = 256 * 1024
+# Leading bytes of the formats the image commands fetch
+MAGIC = (b"\x89PNG", b"\xff\xd8\xff", b"GIF8", b"BM", b"II*\x00",
+    b"MM\x00*")
+HEIF_BRANDS = (b"avif", b"avis", b"heic", b"heix", b"mif1")
+
+
+class ImageDownloadError(ValueError):
+    pass
+
+
+def looks_like_image(head: bytes):
+    return head.startswith(MAGIC) \
+        or head[:4] == b"RIFF" and head[8:12] == b"WEBP" \
+        or head[4:8] == b"ftyp" and head[8:12] in HEIF_BRANDS
+
+
+async def fetch_image(http_client, url: str, headers: dict = None,
+    params: dict = None, max_bytes: int = IMAGE_MAX_MB * 1024 * 1024):
+    """Streams an image into one buffer, giving up as soon as the response
+    is too big, isn't an image, or has a header describing too many pixels"""
+
+    async with http_client.stream("GET", url, headers=headers, params=params,
+        follow_redirects=True) as r:
+        r.raise_for_status()
+
+        content_type = r.headers.get("Content-Type", "")
+        if content_type.startswith("text/") or "json" in content_type:
+            raise ImageDownloadError(f"{url} is {content_type}, not an image")
+        if int(r.headers.get("Content-Length", 0)) > max_bytes:
+            raise ImageDownloadError(f"{url} is over {max_bytes} bytes")
+
+        data = bytearray()
+        parser = ImageFile.Parser()
+        async for chunk in r.aiter_bytes():
+            head_done = len(data) >= 12
+            data += chunk
+            if len(data) > max_bytes:
+                raise ImageDownloadError(f"{url} is over {max_bytes} bytes")
+
+            if not head_done and len(data) >= 12 \
+                and not looks_like_image(bytes(data[:12])):
+                raise ImageDownloadError(f"{url} isn't an image")
+
+            # Only feed PIL until it has read the header, or given up on
+            # doing so before the end
+            if not parser.image and len(data) - len(chunk) < SNIFF_BYTES:
+                parser.feed(chunk)
+                if parser.image:
+                    width, height = parser.image.size
+                    if width * height > Image.MAX_IMAGE_PIXELS:
+                        raise ImageDownloadError(
+                            f"{url} is {width}x{height}, too large")
+
+        if len(data) < 12:
+            raise ImageDownloadError(f"{url} isn't an image")
+
+    return bytes(data)
+
+
+# Encoder settings. PNG and WebP trade a little size for much faster
+# encodes, lossy quality stays at PIL's defaults.
+SAVE_OPTIONS = {
+    "PNG": {"compress_level": 3},
+    "JPEG": {"quality": 75},
+    "WEBP": {"quality": 80, "method": 2},
+}
+
+
+def process_image(data: bytes, crop: bool = False, resize: float = 0.0,
+    resample: int = 0, rotate: int = 0, mode: str = None,
+    img_format: str = None):
+    """Decode, transform and re-encode an image, runs in a worker process.
+    If nothing would change the original bytes are returned as they are."""
+
+    img = Image.open(BytesIO(data))
+    source_format = img.format
+    if not img_format:
+        img_format = img.format
+    changed = img_format.upper() != source_format
+
+    if mode and mode != img.mode:
+        img = img.convert(mode)
+        changed = True
+
+    if crop:
+        bbox = img.getbbox()
+        if bbox and bbox != (0, 0, img.width, img.height):
+            img = img.crop(bbox)
+            changed = True
+
+    if rotate:
+        img = img.rotate(rotate, expand=1)
+        changed = True
+
+    if resize > 0.0:
+        img = img.resize(
+            (int(img.width*resize), int(img.height*resize)),
+            resample=resample)
+        changed = True
+
+    if not changed:
+        return data
+
+    with BytesIO() as img_binary:
+        img.save(img_binary, img_format,
+            **SAVE_OPTIONS.get(img_format.upper(), {}))
+        return img_binary.getvalue()
+
+
+class ImagePool:
+    """Process pool all PIL work goes through, bounded so bursts queue up
+    on the semaphore rather than piling onto the executor. Workers are
+    spawned rather than forked since the bot is already multi-threaded,
+    and a pool broken by a dead worker is replaced instead of failing
+    every image after it."""
+
+    def __init__(self, workers: int = IMAGE_WORKERS,
+        queue_size: int = IMAGE_QUEUE):
+        self.workers = workers
+        self.executor = self.new_executor()
+        self.slots = asyncio.Semaphore(workers + queue_size)
+
+    def new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, func, *args, **kwargs):
+        async with self.slots:
+            executor = self.executor
+            try:
+                return await asyncio.wrap_future(
+                    executor.submit(func, *args, **kwargs))
+            except BrokenProcessPool:
+                # Another job may have already replaced it
+                if self.executor is executor:
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.executor = self.new_executor()
+                return await asyncio.wrap_future(
+                    self.executor.submit(func, *args, **kwargs))
+
+    async def process(self, data: bytes, **kwargs):
+        return await self.run(process_image, data, **kwargs)
@@ -0,0 +1,120 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+from random import choice, randrange
+
+
+class RosterStore:
+    """Gacha character rosters stored one row per character, so a pull only
+    ever reads the row it picked. Rosters in use are kept in memory."""
+
+    def __init__(self, db):
+        self.db = db
+        self.meta = {}
+        self.hot = {}
+        self.loading = {}
+
+    async def info(self, game: str):
+        """Returns (updated, size) for a stored roster, or None"""
+
+        if game not in self.meta:
+            row = await self.db.fetchrow("""SELECT updated, size
+                FROM gacha_rosters WHERE game=$1""", game)
+            if not row:
+                if not await self.import_json(game):
+                    return None
+                row = await self.db.fetchrow("""SELECT updated, size
+                    FROM gacha_rosters WHERE game=$1""", game)
+            self.meta[game] = (row["updated"], row["size"])
+
+        return self.meta[game]
+
+
+    async def pick(self, game: str):
+        """Random character from a roster, by index while it's cold"""
+
+        if game in self.hot:
+            return choice(self.hot[game])
+
+        updated, size = await self.info(game)
+        row = await self.db.fetchrow("""SELECT data FROM gacha_characters
+            WHERE game=$1 AND idx=$2""", game, randrange(size))
+
+        # Roster shrank under us while being swapped, just load it
+        if not row:
+            await self.load(game)
+            return choice(self.hot[game])
+
+        if game not in self.loading:
+            self.loading[game] = asyncio.create_task(self.load(game))
+
+        return json.loads(row["data"])
+
+
+    async def load(self, game: str):
+        version = self.meta.get(game)
+        try:
+            rows = await self.db.fetch("""SELECT data FROM gacha_characters
+                WHERE game=$1 ORDER BY idx""", game)
+            # A put() while this ran already holds the newer roster
+            if self.meta.get(game) == version:
+                self.hot[game] = [json.loads(row["data"]) for row in rows]
+        finally:
+            self.loading.pop(game, None)
+
+
+    async def bad_pages(self, game: str):
+        rows = await self.db.fetch(
+            "SELECT pageid FROM gacha_bad_pages WHERE game=$1", game)
+
+        return [row["pageid"] for row in rows]
+
+
+    async def add_bad_page(self, game: str, pageid: int):
+        await self.db.execute("""INSERT INTO gacha_bad_pages VALUES ($1, $2)
+            ON CONFLICT DO NOTHING""", game, pageid)
+
+
+    async def put(self, game: str, characters: list, bad_pages: list = [],
+        updated: datetime = None):
+
+        if not updated:
+            updated = datetime.now(timezone.utc)
+
+        async with self.db.acquire() as con:
+            async with con.transaction():
+                await con.execute(
+                    "DELETE FROM gacha_characters WHERE game=$1", game)
+                await con.executemany(
+                    "INSERT INTO gacha_characters VALUES ($1, $2, $3)",
+                    [(game, i, json.dumps(c))
+                        for i, c in enumerate(characters)])
+                await con.executemany("""INSERT INTO gacha_bad_pages
+                    VALUES ($1, $2) ON CONFLICT DO NOTHING""",
+                    [(game, p) for p in bad_pages])
+                await con.execute("""INSERT INTO gacha_rosters
+                    VALUES ($1, $2, $3) ON CONFLICT (game) DO UPDATE
+                    SET updated=$2, size=$3""",
+                    game, updated, len(characters))
+
+        self.meta[game] = (updated, len(characters))
+        self.hot[game] = characters
+
+
+    async def import_json(self, game: str):
+        """Moves an old ext/data/gacha/<game>.json cache into the store"""
+
+        try:
+            with open(f"ext/data/gacha/{game}.json", encoding="utf-8") as f:
+                j = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        characters = j["characters"]
+        if isinstance(characters, dict):
+            characters = [list(c) for c in characters.items()]
+
+        await self.put(game, characters, j.get("bad_pages", []),
+            datetime.fromtimestamp(j["updated"], timezone.utc))
+
+        return True
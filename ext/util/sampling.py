@@ -0,0 +1,38 @@
+from random import random, randrange
+
+
+class AliasTable:
+    """Walker's alias method, O(n) to build and O(1) per weighted pick.
+    Without weights every item is equally likely."""
+
+    def __init__(self, items, weights=None):
+        self.items = list(items)
+        self.prob = None
+        self.alias = None
+        if weights is None:
+            return
+
+        n = len(self.items)
+        total = sum(weights)
+        scaled = [w * n / total for w in weights]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+
+    def __len__(self):
+        return len(self.items)
+
+    def pick(self):
+        i = randrange(len(self.items))
+        if self.prob is None or random() < self.prob[i]:
+            return self.items[i]
+
+        return self.items[self.alias[i]]